@@ -0,0 +1,107 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+# Bump to invalidate every cached artifact
+ARTIFACT_CACHE_VERSION = 1
+
+# the cache directory used when none is given, kept apart from the input data
+DEFAULT_CACHE_DIR = "pipeline_cache"
+
+
+def file_digest(filename):
+    """Hashes the contents of a file
+
+    Parameters:
+        filename: str
+            The path of the file
+
+    Returns:
+        digest: str
+            The hexadecimal SHA-256 digest of the file, or "missing" if it
+            does not exist
+    """
+    if not os.path.exists(filename):
+        return "missing"
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as fo:
+        for chunk in iter(lambda: fo.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """The outputs of pipeline stages memoized on disk
+
+    Each artifact is a pickle file named after its stage and a hash of the
+    key it was computed from (the digests of its input files, its
+    parameters and the keys of the stages it depends on), so changing one
+    input or parameter only recomputes the stages whose keys contain it.
+    Artifacts are written to a temporary file that is then renamed, so an
+    interrupted run leaves either a whole artifact or none, and runs in other
+    processes never read a partial one.
+    """
+
+    def __init__(self, cache_dir):
+        """
+        Parameters:
+            cache_dir: str
+                The directory holding the artifacts
+        """
+        self.cache_dir = cache_dir
+
+    def path(self, stage, key):
+        """Returns the file of an artifact
+
+        Parameters:
+            stage: str
+                The name of the stage
+            key: tuple
+                The digests and parameters the artifact depends on, made of
+                strings, numbers, None and tuples (their repr is hashed)
+
+        Returns:
+            path: str
+        """
+        digest = hashlib.sha256(repr(
+            (ARTIFACT_CACHE_VERSION, stage, key)).encode()).hexdigest()
+        return os.path.join(self.cache_dir,
+                            "{}_{}.pkl".format(stage, digest[:32]))
+
+    def get_or_compute(self, stage, key, compute):
+        """Returns a cached artifact, computing and storing it when missing
+
+        Parameters:
+            stage: str
+                The name of the stage
+            key: tuple
+                See path
+            compute: Callable[[], object]
+                Computes the artifact
+
+        Returns:
+            artifact: object
+        """
+        cache_file = self.path(stage, key)
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'rb') as fo:
+                    return pickle.load(fo)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                # an unreadable artifact is recomputed and replaced
+                pass
+
+        artifact = compute()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        handle, temp_file = tempfile.mkstemp(dir=self.cache_dir,
+                                             suffix=".pkl.tmp")
+        try:
+            with os.fdopen(handle, 'wb') as fo:
+                pickle.dump(artifact, fo, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, cache_file)
+        except Exception:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+        return artifact
@@ -0,0 +1,165 @@
+import time
+import traceback
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+# the outcome of one bug: result is None and error holds the traceback when
+# the bug failed; timings maps each stage (and "total") to seconds
+BugRun = namedtuple("BugRun", ["bug", "result", "error", "timings"])
+
+# the columns of a timings table, see timing_rows
+TIMING_COLUMNS = ["Bug", "Stage", "Seconds"]
+
+
+def run_bug(function, bug):
+    """Runs the pipeline of one bug, timing it and catching its failure
+
+    Parameters:
+        function: Callable[[int, dict], object]
+            The pipeline; called as function(bug, timings), it may record the
+            seconds spent in each of its stages in timings
+        bug: int
+            The bug identifier
+
+    Returns:
+        run: BugRun
+            The result or the error of the bug, and its timings
+    """
+    timings: Optional[dict] = dict()
+    start = time.perf_counter()
+    try:
+        result = function(bug, timings)
+        error = None
+    except Exception:
+        result = None
+        error = traceback.format_exc()
+    timings["total"] = time.perf_counter() - start
+    return BugRun(bug, result, error, timings)
+
+
+def run_alone(function, bug, initializer=None, initargs=()):
+    """Runs the pipeline of one bug in its own worker process, so that the
+    bug is blamed if the process dies (out of memory, crash, os._exit)
+
+    Parameters:
+        function: Callable[[int, dict], object]
+            The pipeline, see run_bug
+        bug: int
+            The bug identifier
+        initializer: Callable
+            Called with initargs when the worker process starts
+        initargs: tuple
+
+    Returns:
+        run: BugRun
+            The outcome of the bug; the error is the BrokenProcessPool
+            traceback when its process died, or the traceback of the failure
+            to send its result back (a result that cannot be pickled)
+    """
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=1, initializer=initializer,
+                             initargs=initargs) as executor:
+        try:
+            return executor.submit(run_bug, function, bug).result()
+        except Exception:
+            return BugRun(bug, None, traceback.format_exc(),
+                          {"total": time.perf_counter() - start})
+
+
+def run_batch(function, bugs, workers=None, initializer=None, initargs=()):
+    """Runs the pipeline of many bugs, each one isolated from the failures
+    of the others
+
+    An exception raised by a bug is caught by run_bug. When a worker process
+    dies instead, the pool breaks and every bug it was running fails with
+    BrokenProcessPool; those bugs are then rerun one at a time with
+    run_alone, so only the bug that kills its process gets an error, and the
+    remaining bugs continue in a new pool. At most workers bugs are handed
+    to a pool at a time, so a break only affects the bugs being run. Any
+    other failure to get the outcome of a bug from its worker, such as a
+    result that cannot be pickled, is the error of that bug alone.
+
+    Parameters:
+        function: Callable[[int, dict], object]
+            The pipeline, see run_bug; it must be defined at module level (or
+            be a partial of such a function) when workers is given
+        bugs: Iterable[int]
+            The bug identifiers
+        workers: int
+            The number of worker processes (default None, run in this
+            process)
+        initializer: Callable
+            Called with initargs when each worker process starts
+        initargs: tuple
+
+    Yields:
+        run: BugRun
+            The outcome of each bug, in the order of bugs without workers and
+            in the order they finish with workers
+    """
+    if workers is None:
+        for bug in bugs:
+            yield run_bug(function, bug)
+        return
+
+    bugs = deque(bugs)
+    while bugs:
+        suspects: Optional[list] = list()
+        with ProcessPoolExecutor(max_workers=workers, initializer=initializer,
+                                 initargs=initargs) as executor:
+            running: Optional[dict] = dict()
+            while bugs or running:
+                while bugs and len(running) < workers and not suspects:
+                    bug = bugs.popleft()
+                    running[executor.submit(run_bug, function, bug)] = \
+                        (bug, time.perf_counter())
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    bug, start = running.pop(future)
+                    try:
+                        run = future.result()
+                    except BrokenProcessPool:
+                        suspects.append(bug)
+                        continue
+                    except Exception:
+                        run = BugRun(bug, None, traceback.format_exc(),
+                                     {"total": time.perf_counter() - start})
+                    yield run
+        for bug in suspects:
+            yield run_alone(function, bug, initializer, initargs)
+
+
+def timing_rows(run):
+    """Turns the timings of a bug into timings table rows
+
+    Parameters:
+        run: BugRun
+            The outcome of the bug
+
+    Returns:
+        rows: list[list]
+            One row per stage, in the order of TIMING_COLUMNS
+    """
+    return [[run.bug, stage, seconds] for stage, seconds in
+            run.timings.items()]
+
+
+def parse_bugs(text):
+    """Parses a list of bugs such as "1-5,14,21"
+
+    Parameters:
+        text: str
+            Comma separated bug identifiers or inclusive ranges
+
+    Returns:
+        bugs: list[int]
+    """
+    bugs: Optional[list] = list()
+    for part in text.split(","):
+        first, _, last = part.partition("-")
+        bugs.extend(range(int(first), int(last or first) + 1))
+    return bugs
@@ -0,0 +1,87 @@
+import re
+import time
+
+from naturalness_tools import canonical_subtoken, collect_scores, \
+    parse_score_line
+
+# The regex generate_scores used before parse_score_line. It is kept here
+# only to compare output and speed against the split based parser.
+legacy_score_reading_pattern = re.compile(
+    r"[A-Z_(]*([\d]*)[)]<([\d]*[\"]*[']*[ ]*[a-z]*[A-Z]*[.]*[:]*[\_]*[(]*[)]*[>]*)*-> ([\"'\d*[a-z]]*[.a-zA-Z0-9_\"\/',<> $?\[\]:()\\-]*)#(\d.\d*[A-Z]*-*[0-9]*)*#(\d.\d*[A-Z]*-*[0-9]*)*#[a-z]*#(\d.\d*)([A-Z]-[0-9])*#[a-z]*#[a-z]*#(\d.\d*)([A-Z]-[0-9])*")
+
+
+def legacy_parse_score_line(line, canonical=True):
+    """ Parses one line of mml_confidence_data.csv with the legacy regex
+
+    :param line: str
+            A line of mml_confidence_data.csv
+    :param canonical: bool
+            See documentation for naturalness_tools.parse_score_line
+    :return: tuple((int, str), float[]) or None
+            See documentation for naturalness_tools.parse_score_line
+    """
+    match = legacy_score_reading_pattern.match(line)
+    if not match:
+        return None
+    subtoken = match.group(3)
+    if subtoken.startswith("\"") or subtoken.startswith("\'"):
+        subtoken = subtoken[1:-1]
+    if canonical:
+        subtoken = canonical_subtoken(subtoken)
+    return (int(match.group(1)), subtoken), \
+        [float(match.group(4)), float(match.group(5))]
+
+
+def parse_all(parser, lines):
+    """ Parses lines with the given line parser and collects their scores
+    with collect_scores, as generate_scores does
+
+    :param parser: Callable[[str, bool], tuple]
+            parse_score_line or legacy_parse_score_line
+    :param lines: list[str]
+            The lines of mml_confidence_data.csv
+    :return: Dict[int[], int[]]
+            A mapping from the token and subtoken identifiers to their first
+            two naturalness scores
+    """
+    scores = collect_scores(parser(line, canonical=False) for line in lines)
+    # the legacy regex only reads the first two score columns
+    return {key: values[:2] for key, values in scores.items()}
+
+
+def benchmark(mml_csv, repeat=1000):
+    """ Times both parsers on a sample file and checks they agree
+
+    :param mml_csv: str
+            The path to a sample mml_confidence_data.csv
+    :param repeat: int
+            How many times the lines of the file are parsed
+    :return: tuple(float, float)
+            The lines per second for the legacy and the split based parser
+    """
+    with open(mml_csv, 'r') as fo:
+        lines = fo.readlines()
+
+    if parse_all(legacy_parse_score_line, lines) != \
+            parse_all(parse_score_line, lines):
+        raise ValueError("Parsers disagree on: {}".format(mml_csv))
+
+    rates = []
+    for parser in (legacy_parse_score_line, parse_score_line):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            parse_all(parser, lines)
+        elapsed = time.perf_counter() - start
+        rates.append(len(lines) * repeat / elapsed)
+    return tuple(rates)
+
+
+if __name__ == "__main__":
+    import sys
+
+    files = sys.argv[1:] or ["test2.txt"]
+    for filename in files:
+        legacy_rate, split_rate = benchmark(filename)
+        print("{}: legacy regex {:,.0f} lines/sec, split parser {:,.0f} "
+              "lines/sec ({:.1f}x), identical output".format(
+                filename, legacy_rate, split_rate, split_rate / legacy_rate))
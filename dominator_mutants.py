@@ -364,6 +364,63 @@ class Graph:
 
             return tests_covered
 
+    def tests_covered_all(self):
+        """Returns the tests covered by every node of the graph
+
+        Computes get_tests_covered for all the nodes in one pass: the nodes
+        are visited children first (reverse topological order), so each node
+        unions the results of its direct children once, and nodes shared by
+        several parents are computed once. The sets of tests are int bitsets
+        with one bit per test identifier.
+
+        Returns:
+            (tuple): containing
+                tests: list[int]
+                    The sorted test identifiers; test tests[i] is bit i
+                tests_covered: dict[Node: int]
+                    The bitset of the tests covered by each node
+        """
+        tests = sorted(set().union(*(node.tests for node in self.nodes)))
+        test_bits = {test: 1 << bit for bit, test in enumerate(tests)}
+
+        tests_covered: Optional[dict] = dict()
+        for root in self.nodes:
+            # iterative depth-first search, a node is finished after all of
+            # its children
+            stack = [(root, False)]
+            while stack:
+                node, children_done = stack.pop()
+                if node in tests_covered:
+                    continue
+                if node.children == set():
+                    bits = 0
+                    for test in node.tests:
+                        bits |= test_bits[test]
+                    tests_covered[node] = bits
+                elif children_done:
+                    bits = 0
+                    for child in node.children:
+                        bits |= tests_covered[child]
+                    tests_covered[node] = bits
+                else:
+                    stack.append((node, True))
+                    stack.extend((child, False) for child in node.children
+                                 if child not in tests_covered)
+
+        return tests, tests_covered
+
+
+def count_tests(tests):
+    """Returns the number of tests in a test bitset
+
+    Parameters:
+        tests: int
+            A set of tests, one bit per test (see Graph.tests_covered_all)
+    Returns:
+        count: int
+    """
+    return bin(tests).count("1")
+
 
 def calculate_dominating_mutants(kill_map):
     """Calculates a dominating set of mutants
@@ -622,25 +679,132 @@ def convert_csv_to_reverse_killmap(csv_filename):
             return kill_map
 
 
-# TODO document
-def convert_csv_to_unique_killmap(csv_filename):
-    # generate the graph
-    graph = generate_dominator_set_with_csv(csv_filename)[0]
-    nodes = graph.nodes
+def merge_killmaps(kill_map, other_kill_map, offset):
+    """Merges two kill maps in memory, shifting the mutant identifiers of the
+    second one by an offset
+
+    Both kill maps are expected to come from the same test suite, so test
+    identifiers are kept as they are. The kill maps passed in are not
+    modified.
+
+    Parameters:
+        kill_map: A mapping from a set of identifiers from mutants killed to a
+        set of identifiers for tests that kill each mutant.
+        other_kill_map: A kill map whose mutant identifiers are shifted
+        offset: int
+            The amount added to every mutant identifier of other_kill_map
+
+    Returns:
+        merged_kill_map: A mapping from a set of identifiers from mutants
+        killed to a set of identifiers for tests that kill each mutant.
+    """
+    merged_kill_map = {mutant: set(tests) for mutant, tests in
+                       kill_map.items()}
+    for mutant, tests in other_kill_map.items():
+        shifted_mutant = frozenset(identifier + offset for identifier in
+                                   mutant)
+        if shifted_mutant in merged_kill_map:
+            raise ValueError("Mutant identifiers {} collide after applying the "
+                             "offset {}".format(set(mutant), offset))
+        merged_kill_map[shifted_mutant] = set(tests)
+    return merged_kill_map
+
+
+def convert_killmap_to_unique_killmap(kill_map):
+    """Merges the indistinguishable mutants of a kill map
+
+    Parameters:
+        kill_map: A mapping from a set of identifiers from mutants killed to a
+        set of identifiers for tests that kill each mutant.
+
+    Returns:
+        unique_killmap: A mapping from the merged identifiers of each group of
+        indistinguishable mutants to the set of identifiers of the tests that
+        kill them.
+    """
+    graph = calculate_dominating_mutants(kill_map)[0]
     unique_killmap: Optional[dict] = dict()
-    for node in nodes:
+    for node in graph.nodes:
         unique_killmap[node.mutant_identifier] = node.tests
 
     return unique_killmap
 
 
-# TODO document
-def convert_csv_to_unique_reverse_killmap(csv_filename):
-    killmap = convert_csv_to_unique_killmap(csv_filename)
+def convert_unique_killmap_to_reverse_killmap(unique_killmap):
+    """Inverts a unique kill map into a mapping from tests to the mutants they
+    kill
+
+    Parameters:
+        unique_killmap: A mapping from the merged identifiers of each group of
+        indistinguishable mutants to the set of identifiers of the tests that
+        kill them.
+
+    Returns:
+        unique_reverse_killmap: A mapping from each test identifier to the
+        set of merged mutant identifiers it kills.
+    """
     unique_reverse_killmap: Optional[dict] = dict()
-    for mutant in killmap:
-        for test in killmap[mutant]:
+    for mutant in unique_killmap:
+        for test in unique_killmap[mutant]:
             s = unique_reverse_killmap.get(test, set())
             s.add(mutant)
             unique_reverse_killmap[test] = s
     return unique_reverse_killmap
+
+
+def generate_mutant_to_group_index(unique_killmap):
+    """Maps every mutant identifier to the merged group of indistinguishable
+    mutants it belongs to in a unique kill map
+
+    Parameters:
+        unique_killmap: A mapping from the merged identifiers of each group of
+        indistinguishable mutants to the set of identifiers of the tests that
+        kill them.
+
+    Returns:
+        mutant_to_group: dict[int, frozenset]
+            A mapping from each mutant identifier to its group's key in
+            unique_killmap
+    """
+    mutant_to_group: Optional[dict] = dict()
+    for group in unique_killmap:
+        for mutant in group:
+            mutant_to_group[mutant] = group
+    return mutant_to_group
+
+
+# TODO document
+def convert_csv_to_unique_killmap(csv_filename):
+    # generate the graph
+    return convert_killmap_to_unique_killmap(
+        convert_csv_to_killmap(csv_filename))
+
+
+# TODO document
+def convert_csv_to_unique_reverse_killmap(csv_filename):
+    return convert_unique_killmap_to_reverse_killmap(
+        convert_csv_to_unique_killmap(csv_filename))
+
+
+def convert_csv_to_unique_killmap_and_index(csv_filename):
+    """Loads a unique kill map together with its mutant to group index
+
+    See documentation for convert_csv_to_unique_killmap and
+    generate_mutant_to_group_index.
+
+    Parameters:
+        csv_filename: .csv document
+            A csv document generated by the Major framework containing a
+            mapping from mutants to the tests they kill
+
+    Returns:
+        (tuple): containing
+            unique_killmap: dict[frozenset, set[int]]
+                A mapping from the merged identifiers of each group of
+                indistinguishable mutants to the tests that kill them.
+            mutant_to_group: dict[int, frozenset]
+                A mapping from each mutant identifier to its group's key in
+                unique_killmap
+    """
+    unique_killmap = convert_csv_to_unique_killmap(csv_filename)
+    return unique_killmap, generate_mutant_to_group_index(unique_killmap)
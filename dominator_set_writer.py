@@ -0,0 +1,172 @@
+import csv
+import io
+import os
+import struct
+from typing import Optional
+
+from dominator_mutants import count_tests
+
+# Every binary dominator set file starts with this tag so that appending to
+# (or reading) a file of a different kind fails loudly
+BINARY_MAGIC = b"DMS1"
+# bug identifier, number of mutant identifiers, number of covered tests (or
+# UNKNOWN_TESTS), followed by the sorted mutant identifiers
+BINARY_RECORD_HEADER = struct.Struct("<iii")
+# the number of covered tests stored in a binary record when it is unknown
+# (rows from a txt relation); read back as None
+UNKNOWN_TESTS = -1
+# the columns of data/dominator_set.csv, preceded by the bug so the results
+# of many bugs can share one file. "Mutant No" holds the space separated
+# identifiers of the merged mutants of a dominator, and "Number of tests" is
+# empty when it is unknown
+CSV_HEADER = ["Bug", "Mutant No", "Number of tests"]
+
+
+def graph_dominator_set_rows(bug, result):
+    """Flattens the result of dominator_mutants.calculate_dominating_mutants
+    into rows that can be written in bulk
+
+    Parameters:
+        bug: int
+            The bug identifier the dominator set was computed for
+        result: tuple
+            (graph, dominator_mutants_set, dominator_mutants_set_actual_mutant)
+
+    Yields:
+        row: tuple(int, frozenset, int)
+            The bug identifier, the merged mutant identifiers of a dominator
+            and the number of tests it covers
+    """
+    graph, _, dominator_nodes = result
+    tests_covered = graph.tests_covered_all()[1]
+    for node in dominator_nodes:
+        yield bug, frozenset(node.mutant_identifier), \
+              count_tests(tests_covered[node])
+
+
+def txt_dominator_set_rows(bug, result):
+    """Flattens the result of txt_to_dominator_mutants.
+    generate_dominator_mutants into rows that can be written in bulk
+
+    The txt relation does not carry test identifiers, so the number of
+    covered tests of its rows is None.
+
+    Parameters:
+        bug: int
+            The bug identifier the dominator set was computed for
+        result: tuple
+            (dominator_set_by_mutant_name, dominator_set_by_group)
+
+    Yields:
+        row: tuple(int, frozenset, None)
+            The bug identifier and the merged mutant identifiers of a
+            dominator
+    """
+    for mutant_names in result[0]:
+        yield bug, frozenset(mutant_names), None
+
+
+def write_dominator_sets(filename, rows, binary=False, append=False,
+                         buffer_size=1 << 20):
+    """Writes dominator set rows for one or many bugs through a single buffered
+    stream
+
+    In CSV mode, the merged mutant identifiers of a dominator are written in
+    one column separated by spaces, and an unknown number of tests is an
+    empty field (see CSV_HEADER). In binary mode, it is UNKNOWN_TESTS. The
+    header is only written when the file is new or empty, so results for
+    many bugs can be appended to one file.
+
+    Parameters:
+        filename: str
+            The path of the result file
+        rows: Iterable[tuple(int, frozenset, int)]
+            Rows as produced by graph_dominator_set_rows or
+            txt_dominator_set_rows
+        binary: bool
+            Writes the compact binary format instead of CSV (default False)
+        append: bool
+            Appends to an existing file instead of overwriting it
+            (default False)
+        buffer_size: int
+            The size of the write buffer in bytes (default 1 MiB)
+
+    Returns:
+        count: int
+            The number of rows written
+    """
+    new_file = not append or not os.path.exists(filename) or \
+        os.path.getsize(filename) == 0
+    if binary and not new_file:
+        with open(filename, 'rb') as existing:
+            if existing.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+                raise ValueError(
+                    "Not a binary dominator set file: {}".format(filename))
+
+    count = 0
+    mode = 'ab' if append else 'wb'
+    with open(filename, mode, buffering=buffer_size) as fo:
+        if binary:
+            if new_file:
+                fo.write(BINARY_MAGIC)
+            for bug, mutants, tests in rows:
+                identifiers = sorted(mutants)
+                fo.write(BINARY_RECORD_HEADER.pack(
+                    bug, len(identifiers),
+                    UNKNOWN_TESTS if tests is None else tests))
+                fo.write(struct.pack("<{}i".format(len(identifiers)),
+                                     *identifiers))
+                count += 1
+        else:
+            text = io.TextIOWrapper(fo, newline='', write_through=True)
+            writer = csv.writer(text)
+            if new_file:
+                writer.writerow(CSV_HEADER)
+            for bug, mutants, tests in rows:
+                writer.writerow([bug, " ".join(map(str, sorted(mutants))),
+                                 "" if tests is None else tests])
+                count += 1
+            text.detach()
+    return count
+
+
+def read_dominator_sets(filename, binary=False):
+    """Reads the rows written by write_dominator_sets
+
+    Parameters:
+        filename: str
+            The path of the result file
+        binary: bool
+            Reads the compact binary format instead of CSV (default False)
+
+    Returns:
+        rows: list[tuple(int, frozenset, int)]
+            The bug identifier, the merged mutant identifiers of a dominator
+            and the number of tests it covers (None when unknown) for each
+            row
+    """
+    rows: Optional[list] = list()
+    if binary:
+        with open(filename, 'rb') as fo:
+            data = fo.read()
+        if data[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+            raise ValueError(
+                "Not a binary dominator set file: {}".format(filename))
+        offset = len(BINARY_MAGIC)
+        while offset < len(data):
+            bug, size, tests = BINARY_RECORD_HEADER.unpack_from(data, offset)
+            offset += BINARY_RECORD_HEADER.size
+            identifiers = struct.unpack_from("<{}i".format(size), data,
+                                             offset)
+            offset += 4 * size
+            rows.append((bug, frozenset(identifiers),
+                         None if tests == UNKNOWN_TESTS else tests))
+    else:
+        with open(filename, newline='') as fo:
+            reader = csv.reader(fo)
+            # skipping the header
+            next(reader, None)
+            for bug, mutants, tests in reader:
+                rows.append((int(bug), frozenset(map(int, mutants.split())),
+                             int(tests) if tests else None))
+    return rows
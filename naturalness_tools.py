@@ -1,37 +1,197 @@
-import csv
+import hashlib
+import os
+import os.path
 import re
+import sys
+import tempfile
+import zipfile
+from array import array
+from collections import namedtuple
+from functools import lru_cache
 from typing import Optional, Dict
 
+import numpy as np
+
+from artifact_cache import DEFAULT_CACHE_DIR
+from dominator_mutants import convert_csv_to_killmap, merge_killmaps
+
+# Added to natural mutant identifiers when they are merged with traditional
+# mutants, see natural_offset_killmap
+NATURAL_MUTANT_OFFSET = 20100
+
+# Java numeric literals such as 0, 0L, 1.0F, .5, 1e3 or 2.5d
+numeric_literal_pattern = re.compile(
+    r"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?[lLfFdD]?")
+# TOKREP_GLOBAL(591)< header of an mml_confidence_data.csv line
+score_header_pattern = re.compile(r"TOKREP_[A-Z_]*\((\d+)\)<")
+
+# The numeric columns of an mml_confidence_data.csv line after its subtoken
+# (the others are true/false flags)
+SCORE_FIELDS = (1, 2, 4, 7)
+
+# Bumped whenever parsing or canonicalization changes, so naturalness score
+# caches written by an older version are not reused
+NATURALNESS_CACHE_VERSION = 2
+
+# Compact mutant -> (token, subtoken) table read from mutants.log
+MutantTokens = namedtuple("MutantTokens", ["mutants", "tokens", "subtokens"])
+
+
+@lru_cache(maxsize=1 << 16)
+def canonical_subtoken(subtoken):
+    """ Returns the canonical spelling of a subtoken
+
+    The same literal is not always spelled the same way in mutants.log and in
+    mml_confidence_data.csv (e.g. 0L and 0, 1.0F and 1, ' ' and a space).
+    Both files are canonicalized with this function when they are loaded, so
+    matching a mutant to its score is an exact key comparison.
+
+    Numeric literals lose their type suffix and are written as the repr of
+    their float value; a quoted space becomes a space; anything else is
+    returned unchanged. Results are memoized in a bounded LRU cache since the
+    same subtokens repeat throughout both files.
+
+    :param subtoken: str
+            A subtoken with its surrounding quotes already removed
+    :return: str
+            The canonical spelling of the subtoken
+    """
+    if subtoken == "' '":
+        return " "
+    if numeric_literal_pattern.fullmatch(subtoken):
+        if subtoken[-1] in "lLfFdD":
+            subtoken = subtoken[:-1]
+        return repr(float(subtoken))
+    return subtoken
+
+
+def parse_mutant_line(line):
+    """ Parses one line of mutants.log
+
+    A line looks like id;OPERATOR;token;subtoken;... The line is split on
+    its first three ; delimiters. A subtoken that starts with a quote ends at
+    the matching (unescaped) quote, so it may contain ; itself; the quotes
+    are removed. Otherwise, the subtoken ends at the next ;.
+
+    :param line: str
+            A line of mutants.log
+    :return: tuple(int, int, str) or None
+            The mutant identifier, the token identifier and the raw subtoken,
+            or None if the line is not a mutant line
+    """
+    fields = line.rstrip("\r\n").split(";", 3)
+    if len(fields) != 4 or not fields[0].isdigit() or \
+            not fields[2].isdigit():
+        return None
+    rest = fields[3]
+    if rest[:1] in ("\"", "\'"):
+        index = 1
+        while index < len(rest) and rest[index] != rest[0]:
+            # skip escaped characters such as \' inside the quotes
+            index += 2 if rest[index] == "\\" else 1
+        subtoken = rest[1:index]
+    else:
+        subtoken = rest.split(";", 1)[0]
+    return int(fields[0]), int(fields[2]), subtoken
+
 
 def generate_mutant_to_token_mapping(log_file):
     """ Given mutants.log file from tailored mutants data for a bug,
     it creates a mapping from the mutant identifier to its token identifier
 
+    The file is streamed line by line through parse_mutant_line. The mapping
+    is returned as parallel arrays rather than a dictionary: mutants[i] has
+    the token identifier tokens[i] and the subtoken subtokens[i]. Subtokens
+    are stored in their canonical spelling (see canonical_subtoken) and are
+    interned, so repeated subtokens share a single string.
 
     :param log_file: str
                 The path to mutants.log generated by tailored mutant data
-    :return: Dict[int, int[]
-            A dictionary containing a mapping from the mutant identifier to
-            its token identifier
+    :return: MutantTokens
+            The mutant identifiers, their token identifiers and their
+            subtokens
     """
-    mutant_to_token_mapping: Optional[Dict[int, int[-1, -1]]] = dict()
-    tokenization_pattern = re.compile(
-        r"([0-9]*);[A-Z]*;([0-9]*);((([0-9]*[.]*)[ ]*[a-z]*[A-Z]*[.]*[:]*[-]*[,]*[_]*[\"]*[ ]*[']*[()]*[\[]*[\]]*)*)")
+    mutant_to_token_mapping = MutantTokens(array('q'), array('q'), list())
     with open(log_file, 'r') as fo:
         for line in fo:
-            header_match = tokenization_pattern.match(line)
-            if header_match:
-                if header_match.group(3).startswith("\'") or header_match.group(
-                        3).startswith("\""):
-                    subtoken = header_match.group(3)[1:-1]
-                else:
-                    subtoken = header_match.group(3)
-                mutant_to_token_mapping[int(header_match.group(1))] = [
-                    int(header_match.group(2)), subtoken]
-            continue
-            raise ValueError("No pattern matched line: {}".format(line))
+            parsed = parse_mutant_line(line)
+            if parsed is None:
+                continue
+            mutant_to_token_mapping.mutants.append(parsed[0])
+            mutant_to_token_mapping.tokens.append(parsed[1])
+            mutant_to_token_mapping.subtokens.append(
+                sys.intern(canonical_subtoken(parsed[2])))
+
+    return mutant_to_token_mapping
+
+
+def parse_score_line(line, canonical=True):
+    """ Parses one line of mml_confidence_data.csv
+
+    A line looks like
+    TOKREP_LIT(44)<"a.b.C"> -> ','#0.10#0.002#false#0.12#false#true#0.14
+    Only the TOKREP_*(id)<...> header is matched with a (small) regex. The
+    subtoken and the scores are found by splitting on the -> delimiter and
+    on the last seven # delimiters, so a subtoken may contain any character,
+    including # itself.
+
+    :param line: str
+            A line of mml_confidence_data.csv
+    :param canonical: bool
+            Whether the subtoken is returned in its canonical spelling (see
+            canonical_subtoken) or as written, without its quotes
+    :return: tuple((int, str), float[]) or None
+            The (token identifier, subtoken) key and its four
+            numeric score columns (in the order of the line), or None if the
+            line is not a score line
+    """
+    header_match = score_header_pattern.match(line)
+    if not header_match:
+        return None
+    separator = line.find("-> ", header_match.end())
+    if separator == -1:
+        return None
+    fields = line[separator + 3:].rstrip("\r\n").rsplit("#", 7)
+    if len(fields) != 8:
+        return None
+    subtoken = fields[0]
+    if subtoken.startswith("\"") or subtoken.startswith("\'"):
+        subtoken = subtoken[1:-1]
+    try:
+        scores = [float(fields[column]) for column in SCORE_FIELDS]
+    except ValueError:
+        return None
+    if canonical:
+        subtoken = canonical_subtoken(subtoken)
+    return (int(header_match.group(1)), subtoken), scores
+
+
+def collect_scores(parsed_lines):
+    """ Builds the token identifier to naturalness scores mapping from
+    parsed score lines
 
-        return mutant_to_token_mapping
+    Subtokens are stored in their canonical spelling (see
+    canonical_subtoken). When a subtoken is written the same way on several
+    lines, its last score wins; when it is spelled differently (e.g. 0L and
+    0), the score of the first spelling wins.
+
+    :param parsed_lines: Iterable[tuple((int, str), float[]) or None]
+            The lines parsed with parse_score_line(line, canonical=False)
+    :return: Dict[int[], int[]]
+            A dictionary containing a mapping from the token and subtoken
+            identifiers to their naturalness scores
+    """
+    token_prob_position_score: Optional[Dict[int[-1, -1], int[-1, -1]]] = dict()
+    # the first spelling of each canonical (token, subtoken) key
+    spellings: Optional[Dict[tuple, str]] = dict()
+    for parsed in parsed_lines:
+        if parsed is None:
+            continue
+        (token, subtoken), scores = parsed
+        key = (token, canonical_subtoken(subtoken))
+        if spellings.setdefault(key, subtoken) == subtoken:
+            token_prob_position_score[key] = scores
+    return token_prob_position_score
 
 
 def generate_scores(mml_csv):
@@ -39,57 +199,19 @@ def generate_scores(mml_csv):
     data for a given bug. It creates a mapping from the token identifiers for
     that bug to their naturalness scores.
 
-    :param log_file: str
-                The path to mutants.log generated by tailored mutant data
-    :return: Dict[int, int[]
-            A dictionary containing a mapping from the mutant identifier to
-            its token identifier
-    """
-    token_prob_position_score: Optional[Dict[int[-1, -1], int[-1, -1]]] = dict()
-    score_reading_pattern = re.compile(
-        r"[A-Z_(]*([\d]*)[)]<([\d]*[\"]*[']*[ ]*[a-z]*[A-Z]*[.]*[:]*[\_]*[(]*[)]*[>]*)*-> ([\"'\d*[a-z]]*[.a-zA-Z0-9_\"\/',<> $?\[\]:()\\-]*)#(\d.\d*[A-Z]*-*[0-9]*)*#(\d.\d*[A-Z]*-*[0-9]*)*#[a-z]*#(\d.\d*)([A-Z]-[0-9])*#[a-z]*#[a-z]*#(\d.\d*)([A-Z]-[0-9])*")
+    The file is streamed line by line through parse_score_line, see
+    collect_scores.
 
-    counter = 0
+    :param mml_csv: str
+                The path to mml_confidence_data.csv generated by tailored
+                mutant data
+    :return: Dict[int[], int[]]
+            A dictionary containing a mapping from the token and subtoken
+            identifiers to their naturalness scores
+    """
     with open(mml_csv, 'r') as fo:
-        for line in fo:
-            # counter = counter + 1
-            # if counter > 66582:
-            #     print(counter)
-            if line.strip() == "\n" or line == "\n":
-                continue
-            header2_match = score_reading_pattern.match(line)
-            # group 1 -> token number identifier
-            # group 3 -> subtoken number identifier
-            # group 5 -> first
-            # group 9 -> second
-            # mutant_scores_mapping: {[token, subtoken]: []}
-            if header2_match:
-
-                if header2_match.group(3).startswith("\"") or \
-                        header2_match.group(3).startswith("\'"):
-
-                    token_prob_position_score[int(header2_match.group(1)),
-                                              header2_match.group(3)[1:-1]] = \
-                        [float(header2_match.group(4)), float(
-                            header2_match.group(5))]
-
-                elif header2_match.group(3).startswith("true") or \
-                        header2_match.group(3).startswith("false") or \
-                        header2_match.group(3).startswith("0xf"):
-                    token_prob_position_score[int(header2_match.group(1)),
-                                              header2_match.group(3)] = \
-                        [float(header2_match.group(4)), float(
-                            header2_match.group(5))]
-                else:
-
-                    token_prob_position_score[int(header2_match.group(1)),
-                                              header2_match.group(3)] = \
-                        [float(header2_match.group(4)), float(
-                            header2_match.group(5))]
-            continue
-            raise ValueError("No pattern matched line: {}".format(line))
-        # print("out")
-    return token_prob_position_score
+        return collect_scores(parse_score_line(line, canonical=False)
+                              for line in fo)
 
 
 def combine_mapping(mutant_token_mapping, token_prob_position_score):
@@ -97,12 +219,16 @@ def combine_mapping(mutant_token_mapping, token_prob_position_score):
     identifiers and token identifiers to their naturalness scores to create a
     mutant identifier to naturalness score mapping
 
-    :param mutant_token_mapping: Dict[int, int[]
-            A dictionary containing a mapping from the mutant identifier to
-            its token identifier
-    :param token_prob_position_score: Dict[int, int[]
-            A dictionary containing a mapping from the mutant identifier to
-            its token identifier
+    Both mappings hold canonical subtokens (see canonical_subtoken), so the
+    scores, keyed by (token, subtoken), are an index that resolves each
+    mutant with a single dictionary lookup.
+
+    :param mutant_token_mapping: MutantTokens
+            The mutant identifiers with their token identifiers and
+            subtokens, see generate_mutant_to_token_mapping
+    :param token_prob_position_score: Dict[int[], int[]]
+            A dictionary containing a mapping from the token and subtoken
+            identifiers to their naturalness scores
     :return: Dict[int[], int[]]]
             A mapping of mutant identifiers to naturalness scores
 
@@ -110,86 +236,172 @@ def combine_mapping(mutant_token_mapping, token_prob_position_score):
     # for all the mutants
     mutant_prob_position_score: Optional[
         Dict[int[-1, -1], int[-1, -1]]] = dict()
-    counter = 0
-    for mutant in mutant_token_mapping:
-        for tokenSub in token_prob_position_score:
-            if mutant_token_mapping[mutant][0] == tokenSub[0]:
-
-                # if mutant == 754:
-                #     print("mutant token mapping:", mutant_token_mapping[mutant][
-                #         1], "token bug:", tokenSub[1])
-
-                if mutant_token_mapping[mutant][1] == tokenSub[1]:
-                    mutant_prob_position_score[mutant] = \
-                        token_prob_position_score[tokenSub]
-                    # mutants_added.add(mutant)
-                    # count += 1
-                    # print("\tcount: ",count)
-                    break
-                if mutant_token_mapping[mutant][1] == "' '" and tokenSub[1] \
-                        == " ":
-                    mutant_prob_position_score[mutant] = \
-                        token_prob_position_score[tokenSub]
-                    break
-                if mutant_token_mapping[mutant][1] == "0L" and tokenSub[1] \
-                        == "0":
-                    mutant_prob_position_score[mutant] = \
-                        token_prob_position_score[tokenSub]
-                    break
-                if mutant_token_mapping[mutant][1].endswith(".0F") and \
-                        mutant_token_mapping[mutant][1][:-3] == tokenSub[1]:
-                    mutant_prob_position_score[mutant] = \
-                        token_prob_position_score[tokenSub]
-                    break
-                # print(type(mutant))
-                try:
-                    if float(mutant_token_mapping[mutant][1]) == float(
-                            tokenSub[1]):
-                        mutant_prob_position_score[mutant] = \
-                            token_prob_position_score[tokenSub]
-                        break
-
-                except:
-                    continue
+    for mutant, token, subtoken in zip(*mutant_token_mapping):
+        scores = token_prob_position_score.get((token, subtoken))
+        if scores is not None:
+            mutant_prob_position_score[mutant] = scores
 
     return mutant_prob_position_score
 
 
-# TODO document
+def hash_files(*filenames):
+    """ Hashes the contents of files (and the naturalness cache version)
+
+    :param filenames: str
+            The paths of the files to hash, in order
+    :return: str
+            The hexadecimal SHA-256 digest
+    """
+    digest = hashlib.sha256(
+        "naturalness-{}".format(NATURALNESS_CACHE_VERSION).encode())
+    for filename in filenames:
+        with open(filename, 'rb') as fo:
+            for chunk in iter(lambda: fo.read(1 << 20), b''):
+                digest.update(chunk)
+        # keep file boundaries in the digest
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def load_naturalness_scores(log_file, mml_csv, cache_dir=None):
+    """ Returns the mutant identifier to naturalness scores mapping for a bug,
+    reusing a cache on disk when the input files have not changed
+
+    The result of combine_mapping is stored as an .npz file holding an
+    array of mutant identifiers and a (mutants x score columns) float array.
+    The file name contains a hash of the path of mutants.log and a hash of
+    the contents of mutants.log and mml_confidence_data.csv, so a cache is
+    only reused for identical inputs, and the caches of many bugs can share
+    one directory. When a new cache is written, the older caches of the same
+    mutants.log are removed. The cache is written to a temporary file that is
+    then renamed, so runs in other processes never read a partially written
+    cache.
+
+    :param log_file: str
+                The path to mutants.log generated by tailored mutant data
+    :param mml_csv: str
+                The path to mml_confidence_data.csv generated by tailored
+                mutant data
+    :param cache_dir: str
+                The directory holding the cache (default DEFAULT_CACHE_DIR,
+                never the directory of the input data)
+    :return: Dict[int, float[]]
+            A mapping of mutant identifiers to naturalness scores
+    """
+    if cache_dir is None:
+        cache_dir = DEFAULT_CACHE_DIR
+    cache_prefix = "naturalness_scores_{}_".format(hashlib.sha256(
+        os.path.abspath(log_file).encode()).hexdigest()[:16])
+    cache_name = cache_prefix + hash_files(log_file, mml_csv)[:32] + ".npz"
+    cache_file = os.path.join(cache_dir, cache_name)
+
+    if os.path.exists(cache_file):
+        try:
+            with np.load(cache_file) as cached:
+                return dict(zip(cached["mutants"].tolist(),
+                                cached["scores"].tolist()))
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # an unreadable cache is recomputed and replaced
+            pass
+
+    mutant_to_scores = combine_mapping(
+        generate_mutant_to_token_mapping(log_file), generate_scores(mml_csv))
+
+    mutants = np.fromiter(mutant_to_scores, dtype=np.int64,
+                          count=len(mutant_to_scores))
+    scores = np.array(list(mutant_to_scores.values()),
+                      dtype=float).reshape(len(mutants), len(SCORE_FIELDS))
+    os.makedirs(cache_dir, exist_ok=True)
+    handle, temp_file = tempfile.mkstemp(dir=cache_dir, suffix=".npz.tmp")
+    try:
+        with os.fdopen(handle, 'wb') as fo:
+            np.savez(fo, mutants=mutants, scores=scores)
+        os.replace(temp_file, cache_file)
+    except OSError:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+    # the caches of earlier versions of the inputs are never read again
+    for filename in os.listdir(cache_dir):
+        if filename.startswith(cache_prefix) and filename.endswith(".npz") \
+                and filename != cache_name:
+            try:
+                os.remove(os.path.join(cache_dir, filename))
+            except OSError:
+                pass
+    return mutant_to_scores
+
+
+def log_ratio_ranking(scores):
+    """ The default naturalness ranking: -log(score0 / score1)
+
+    :param scores: np.ndarray
+            A (mutants x score columns) array of naturalness scores
+    :return: np.ndarray
+            The ranking key of every mutant; smaller keys are ranked first
+    """
+    return -np.log(scores[:, 0] / scores[:, 1])
+
+
+# Ranking formulas over the score columns of combine_mapping, by name
+NATURALNESS_RANKINGS = {"log_ratio": log_ratio_ranking}
+
+
+def rank_by_naturalness(mutant_to_scores, rankings=None):
+    """ Orders mutants by one or more naturalness ranking formulas at once
+
+    The scores are copied once into a (mutants x score columns) float array.
+    Every formula computes the keys of all mutants in one vectorized call,
+    and the mutants are ordered with a stable argsort (ties keep the order of
+    mutant_to_scores, as sorted() would).
+
+    :param mutant_to_scores: Dict[object, float[]]
+            A mapping from mutants (or groups of mutants) to their
+            naturalness scores, see combine_mapping
+    :param rankings: Dict[str, Callable[[np.ndarray], np.ndarray]]
+            The ranking formulas to compute, by name (default
+            NATURALNESS_RANKINGS)
+    :return: Dict[str, list]
+            The mutants ordered by each ranking formula
+    """
+    if rankings is None:
+        rankings = NATURALNESS_RANKINGS
+    mutants = list(mutant_to_scores)
+    if not mutants:
+        return {name: [] for name in rankings}
+    scores = np.array([mutant_to_scores[mutant] for mutant in mutants],
+                      dtype=float).reshape(len(mutants), -1)
+
+    ordered_mutants: Optional[Dict[str, list]] = dict()
+    for name, ranking in rankings.items():
+        with np.errstate(divide='ignore', invalid='ignore'):
+            keys = ranking(scores)
+        ordered_mutants[name] = [mutants[index] for index in
+                                 np.argsort(keys, kind='stable')]
+    return ordered_mutants
+
+
 def natural_offset_killmap(results_dir):
-    # create a temp offset killmap
-
-    csv_filename2 = results_dir + \
-                    "\\traditional-mutants\\non-triggering\KillMap.csv"
-    offset = 0
-    with open(csv_filename2, newline='') as File0:
-        with open("temp_killMap.csv", "w", newline='') as File3:
-            reader = csv.reader(File0)
-            for line in File0:
-                ++offset
-                File3.write(line)
-            offset += 20000
-
-    csv_filename = results_dir + \
-                   "\\natural-mutants\\non-triggering\KillMap.csv"
-
-    with open(csv_filename, newline='') as File:
-        with open("temp_killMap.csv", "a", newline='') as File2:
-            kill_map = {}
-            reader = csv.reader(File)
-            readerSize = csv.reader(File)
-            writer = csv.writer(File2)
-
-            # skipping the header
-            next(reader)
-            File2.write(str(File.readline()))
-            # print(readerSize)
-            empty_csv_check = next(readerSize, "empty")
-            if empty_csv_check != "empty" and len(empty_csv_check) == 2:
-
-                for k, y in reader:
-                    # converting to integers
-                    k = int(k)
-                    y = int(y)
-                    output_row = (k, y + offset + 100)
-                    writer.writerow(output_row)
+    """ Loads the kill map of all mutants (traditional and natural) for a bug
+
+    The natural mutants' kill map is merged into the traditional mutants'
+    kill map in memory, with the natural mutant identifiers shifted by
+    NATURAL_MUTANT_OFFSET so they do not collide with the traditional ones
+    (merge_killmaps raises a ValueError if they would).
+    Nothing is written to disk, so several bugs can be evaluated at once.
+
+    :param results_dir: str
+                        The directory containing the results files from
+                        tailored mutant data
+    :return: dict[frozenset: set()]
+        A mapping from a set of identifiers from mutants killed to a
+        set of identifiers for tests that kill each mutant.
+    """
+    traditional_killmap = convert_csv_to_killmap(os.path.join(
+        results_dir + "\\traditional-mutants\\non-triggering",
+        "killMap.csv"))
+    natural_killmap = convert_csv_to_killmap(os.path.join(
+        results_dir + "\\natural-mutants\\non-triggering", "killMap.csv"))
+    return merge_killmaps(traditional_killmap, natural_killmap,
+                          NATURAL_MUTANT_OFFSET)
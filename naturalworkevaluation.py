@@ -1,286 +1,255 @@
 import csv
 import os.path
-import pickle
-import random
-from typing import Optional
+import time
+from functools import partial
 
 import numpy as np
 
-import average_taker as at
 import plot_tools as pt
+from artifact_cache import DEFAULT_CACHE_DIR, ArtifactCache
+from batch_runner import TIMING_COLUMNS, parse_bugs, run_batch, timing_rows
 from dominator_mutants import convert_csv_to_killmap, \
     convert_csv_to_unique_killmap, \
-    convert_csv_to_unique_reverse_killmap
+    convert_killmap_to_unique_killmap
 # results_dir is the directory where the results are stored is
-from naturalness_tools import generate_mutant_to_token_mapping, generate_scores, \
-    combine_mapping, natural_offset_killmap
+from naturalness_tools import natural_offset_killmap
+from result_store import DEFAULT_STORE_DIR, ResultStore
 from statistics import bug_stats
+from strategies import METRIC_COLUMNS, BugContext, evaluate_strategies, \
+    metrics_rows, naturalness_order, traditional_naturalness_order
+from work_simulation import KillMatrix, simulate_ordering
 
+# the number of random orderings averaged for each random curve
+NUMBER_OF_TRIALS = 1000
 
-def generate_naturalness(results_dir):
+
+def load_unique_killmap(results_dir, type):
+    """ Loads the unique kill map of one type of mutants of a bug
+
+    :param results_dir: str
+                        The directory containing the results files from
+                        tailored mutant data
+    :param type: str
+                        "traditional-mutants", "natural-mutants" or
+                        "all-mutants" (both, natural mutants offset by
+                        NATURAL_MUTANT_OFFSET)
+    :return: dict[frozenset: set()]
+                        See documentation for convert_csv_to_unique_killmap
+    """
+    if type != "all-mutants":
+        dirpath = results_dir + "\\" + type + "\\non-triggering"
+        return convert_csv_to_unique_killmap(
+            os.path.join(dirpath, "killMap.csv"))
+    return convert_killmap_to_unique_killmap(
+        natural_offset_killmap(results_dir))
+
+
+def generate_naturalness(results_dir, matrix=None):
     """ Generates the work evaluation for all natural mutants.
 
     It grabs the csv/mml files generated by major framework for natural
     mutants. Then, it creates a plot that illustrates the test completeness
     achieved for all natural mutants generated for a given bug.
-    See documentation for convert_csv_to_killmap,
-        convert_csv_to_reverse_killmap, generate_scores,
-        combine_mapping, and generate_eval_plot for more details
+    See documentation for naturalness_order and simulate_ordering for more
+    details
 
     :param results_dir: str
                         The directory containing the results files from
                         tailored mutant data
+    :param matrix: KillMatrix
+                        The kill matrix of the natural mutants (default
+                        loaded from killMap.csv)
     :return: tuple (list[int], int)
                     A tuple containing a list of y-cordinates (as a percentage)
                     for the work evaluation for all natural mutants. and the
                     number of mutants for the evaluation
     """
+    if matrix is None:
+        matrix = KillMatrix(load_unique_killmap(results_dir,
+                                                "natural-mutants"))
+    order = naturalness_order(BugContext(results_dir), matrix)
+    plot, count = simulate_ordering(matrix, order)
+    return [plot], [count]
 
-    # keeping the count of all plots and counts
-    plots: Optional[list] = list()
-    counts: Optional[list] = list()
-
-    dirpath = results_dir + "natural-mutants\\non-triggering"
-
-    # step 2 fetch the killmap
-    killmap = convert_csv_to_unique_killmap(
-        os.path.join(dirpath, "killMap.csv"))
-    rev_killmap = convert_csv_to_unique_reverse_killmap(os.path.join(dirpath,
-                                                                     "killMap.csv"))
-
-    #  getting the total number of mutants for
-    total_number_of_mutants = 0
-    for mutant in killmap.keys():
-        total_number_of_mutants += len(mutant)
-
-    # step 3 in a dictionary (may have to change this) containing from the mutant identifier to token identifiers:
-    #  {mutantID: token, sub-token} . the sub-token would be -1 if it’s the default subtoken.
-
-    log_file_path = os.path.join(dirpath, "mutants.log")
-    mutant_token_sub_mapping: Optional[dict] = \
-        (generate_mutant_to_token_mapping(log_file_path))
-
-    # step 4.1
-    mml_file_path = os.path.join(dirpath, "mml_confidence_data.csv")
-    token_to_score_mapping: Optional[dict] = generate_scores(mml_file_path)
-
-    # step 4.2
-    mutant_to_scores_mapping = combine_mapping(mutant_token_sub_mapping,
-                                               token_to_score_mapping)
-
-    # Filter mutant_to_scores_mapping for mutants only in the killmap
-    filtererd_mutant_to_scores_mapping: Optional[dict] = dict()
-    for mutant in mutant_to_scores_mapping.keys():
-        for killmap_mutants in killmap.keys():
-            if mutant in killmap_mutants:
-                filtererd_mutant_to_scores_mapping[killmap_mutants] = \
-                    mutant_to_scores_mapping[mutant]
-
-    # step 5
-    # randomize mutants
-    sorted_mutants = sorted(filtererd_mutant_to_scores_mapping.keys(),
-                            key=lambda i:
-                            -np.log(filtererd_mutant_to_scores_mapping[i][0] /
-                                    filtererd_mutant_to_scores_mapping[i][1]))
 
-    work_eval_plot = pt.generate_eval_plot(sorted_mutants, killmap, rev_killmap,
-                                           total_number_of_mutants)
-    plots.append(work_eval_plot[0])
-    counts.append(work_eval_plot[1])
-    return plots, counts
+def plot_traditional_naturalness(results_dir, matrix=None):
+    """ Generates the work evaluation for traditional mutants ordered by
+    naturalness. See documentation for traditional_naturalness_order and
+    simulate_ordering for more details
 
-
-# TODO document
-# TODO consider moving
-# TODO factor shared code out
-def plot_traditional_naturalness(results_dir):
-    dirpath = results_dir + "\\traditional-mutants\\non-triggering\\"
-    killmap_file = "killMap.csv"
-    killmap = convert_csv_to_unique_killmap(os.path.join(dirpath, killmap_file))
-    killmap_length = len(
-        convert_csv_to_killmap(os.path.join(dirpath, killmap_file)))
-    rev_killmap = convert_csv_to_unique_reverse_killmap(
-        os.path.join(dirpath, killmap_file))
-
-    # get the sorted list of mutants
-    csv_filename = os.path.join(dirpath, "traditional_naturalness.csv")
-    with open(csv_filename, newline='') as File:
-        sorted_mutants_list = []
-        reader = csv.reader(File)
-        readerSize = csv.reader(File)
-
-        # # skipping the header
-        # next(reader)
-        print(readerSize)
-        empty_csv_check = next(readerSize, "empty")
-        if empty_csv_check != "empty" and len(empty_csv_check) == 1:
-
-            for k, _, _ in reader:
-                # converting to integers
-                for killmap_keys in killmap.keys():
-                    if int(
-                            k) in killmap_keys and killmap_keys not in sorted_mutants_list:
-                        sorted_mutants_list.append(killmap_keys)
-
-    print(sorted_mutants_list)
-    plot = pt.generate_eval_plot(sorted_mutants_list, killmap, rev_killmap,
-                                 killmap_length)
-    return plot
+    :param results_dir: str
+                        The directory containing the results files from
+                        tailored mutant data
+    :param matrix: KillMatrix
+                        The kill matrix of the traditional mutants (default
+                        loaded from killMap.csv)
+    :return: tuple (list[int], int)
+                    A tuple containing a list of y-cordinates (as a percentage)
+                    for the work evaluation and the number of mutants killed
+    """
+    if matrix is None:
+        matrix = KillMatrix(load_unique_killmap(results_dir,
+                                                "traditional-mutants"))
+    order = traditional_naturalness_order(BugContext(results_dir), matrix)
+    return simulate_ordering(matrix, order)
 
 
 # TODO document
-def plot_generator(results_dir, type):
-    if type != "all-mutants":
-        dirpath = results_dir + "\\" + type + "\\non-triggering"
-        killmap_file = "killMap.csv"
-    else:
-        dirpath = ""
-        killmap_file = "temp_killMap.csv"
-    killmap = convert_csv_to_killmap(os.path.join(dirpath, killmap_file))
-    result = pt.generate_test_completeness_plot(killmap)
+def plot_generator(results_dir, type, killmap=None, plot=None):
+    if killmap is None:
+        if type != "all-mutants":
+            dirpath = results_dir + "\\" + type + "\\non-triggering"
+            killmap = convert_csv_to_killmap(
+                os.path.join(dirpath, "killMap.csv"))
+        else:
+            killmap = natural_offset_killmap(results_dir)
+    result = pt.generate_test_completeness_plot(killmap, plot)
     return result
 
 
 # TODO fix documentation
-def bestcase_generator(results_dir, type):
+def bestcase_generator(results_dir, type, rng=None, matrix=None):
     """
 
         It grabs the csv/mml files generated by major framework for traditional
         mutants. Then, it creates a plot that illustrates the test completeness
         achieved for random traditional mutants generated for a given bug.
-        See documentation for convert_csv_to_killmap,
-        convert_csv_to_reverse_killmap, generate_scores,
-        combine_mapping, and generate_eval_plot for more details
+        See documentation for load_unique_killmap and simulate_ordering for
+        more details
 
         :param results_dir: str
                             The directory containing the results files from
                             tailored mutant data
+        :param rng: np.random.Generator
+                            The source of randomness for the ordering and the
+                            tests (default a fresh unseeded generator)
+        :param matrix: KillMatrix
+                            The kill matrix of the mutants (default loaded
+                            from killMap.csv)
         :return: tuple (list[int], int)
                         A tuple containing a list of y-cordinates (as a percentage)
                         for the work evaluation for random traditional mutants
                         and the number of mutants for the evaluation
     """
+    if matrix is None:
+        matrix = KillMatrix(load_unique_killmap(results_dir, type))
+    if rng is None:
+        rng = np.random.default_rng()
 
-    if type != "all-mutants":
-        dirpath = results_dir + "\\" + type + "\\non-triggering"
-        killmap_file = os.path.join(dirpath, "killMap.csv")
+    randomized_groups = rng.permutation(len(matrix.group_sizes))
+    random_eval_plot = simulate_ordering(matrix, randomized_groups, rng)
+    return random_eval_plot
 
-    else:
 
-        dirpath = ""
-        killmap_file = os.path.join(dirpath, "temp_killMap.csv")
+# the curves saved for each bug, in this order
+PLOT_STRATEGIES = ["traditional_bestcase",
+                   "traditional_random",
+                   "natural_bestcase",
+                   "natural_naturalness",
+                   "natural_random",
+                   "all_bestcase",
+                   "all_random",
+                   "traditional_naturalness"]
 
-    killmap = convert_csv_to_unique_killmap(killmap_file)
-    rev_killmap = convert_csv_to_unique_reverse_killmap(killmap_file)
 
-    #  getting the total number of mutants for
-    total_number_of_mutants = 0
-    for mutant in killmap.keys():
-        total_number_of_mutants += len(mutant)
+def bug_results_dir(results_path, bug):
+    """ The directory of the results of one Lang bug
 
-    killmap_mutants = killmap.keys()
-    list_of_mutant: Optional[list] = list()
-    for mutant in killmap_mutants:
-        list_of_mutant.append(mutant)
+    :param results_path: str
+                        The directory containing the results of every bug
+    :param bug: int
+                        The bug number
+    :return: str
+    """
+    return results_path + "Lang\\" + str(bug) + "\\killmatrix\\"
+
+
+def evaluate_bug(results_path, metrics, number_of_trials, cache_dir, bug,
+                 timings):
+    """ Evaluates PLOT_STRATEGIES on one bug, see evaluate_strategies. The
+    argument order lets batch_runner.run_batch call a partial of it
+
+    :param results_path: str
+                        The directory containing the results of every bug
+    :param metrics: bool
+                        Whether to return summary metrics instead of curves
+    :param number_of_trials: int
+                        The number of random orderings of random strategies
+    :param cache_dir: str
+                        The directory of the ArtifactCache memoizing the
+                        pipeline stages (default None, no memoization)
+    :param bug: int
+                        The bug number, also the seed of its random streams
+    :param timings: dict[str: float]
+                        Where the seconds spent on each strategy are recorded
+    :return: dict
+                        The curve or the summary metrics of each strategy
+    """
+    # every strategy of the bug shares the same loaded data
+    cache = ArtifactCache(cache_dir) if cache_dir is not None else None
+    context = BugContext(bug_results_dir(results_path, bug), cache=cache)
+    return evaluate_strategies(context, PLOT_STRATEGIES, number_of_trials,
+                               seed=bug, metrics=metrics, timings=timings)
 
-    randomized_mutants = random.sample(list_of_mutant, len(killmap))
 
-    random_eval_plot = pt.generate_eval_plot(
-        randomized_mutants, killmap, rev_killmap,
-        total_number_of_mutants)
-    return random_eval_plot
+def append_rows(filename, header, rows):
+    """ Appends rows to a CSV table, writing the header for a new file
+
+    :param filename: str
+    :param header: list[str]
+    :param rows: list[list]
+    """
+    write_header = not os.path.exists(filename)
+    with open(filename, 'a', newline='') as table_file:
+        writer = csv.writer(table_file)
+        if write_header:
+            writer.writerow(header)
+        writer.writerows(rows)
 
 
 if __name__ == "__main__":
-    import sys
-
-    debug = True
-
-    if len(sys.argv) != 2:
-        print("Usage <resultsPath>")
-        sys.exit(-1)
-    for i in range(1, 2):
-        # for i in [14, 21, 30, 31, 33, 34, 41, 42, 57, 62]:
-        results_dir = sys.argv[1] + "Lang\\" + str(i) + "\killmatrix\\"
-
-        # try:
-        print("currently generating graph for:", i)
-        results_dir = sys.argv[1] + "Lang\\" + str(i) + "\killmatrix\\"
-        if debug:
-            print("Calculating natural_bestcase")
-        natural_bestcase = plot_generator(results_dir, "natural-mutants")
-        if debug:
-            print("natural_naturalness")
-        natural_naturalness = generate_naturalness(results_dir)
-        if debug:
-            print("traditional_bestcase")
-        traditional_bestcase = plot_generator(results_dir,
-                                              "traditional-mutants")
-        if debug:
-            print("natural_random")
-        natural_random = at.mutants_average(
-            results_dir, "natural-mutants", 10)
-
-        # all_random = all_random_generator(results_dir)[0]
-
-        # create combined killmap for all \
-
-        if debug:
-            print("setting offset killmap")
-        natural_offset_killmap(results_dir)
-
-        if debug:
-            print("all_bestcase")
-        all_bestcase = plot_generator(results_dir, "all-mutants")
-
-        if debug:
-            print("all_random")
-        all_random = at.mutants_average(
-            results_dir, "all-mutants", 10)
-
-        # TODO
-        if debug:
-            print("all_naturalness")
-        all_naturalness = at.mutants_average(
-            results_dir, "all-mutants", 10)
-
-        # TODO
-        if debug:
-            print("traditional_naturalness")
-        traditional_naturalness = plot_traditional_naturalness(results_dir)
-
-        if debug:
-            print("traditional_random")
-        traditional_random = at.mutants_average(
-            results_dir, "traditional-mutants", 10)
-
-        # removing the temp file
-        if debug:
-            print("removing temp_killMap.csv")
-        os.remove("temp_killMap.csv")
-
-        if debug:
-            print("plotting")
-
-        plots = [traditional_bestcase,
-                 traditional_random,
-                 natural_bestcase,
-                 natural_naturalness[0][0],
-                 natural_random,
-                 all_bestcase,
-                 all_random,
-                 traditional_naturalness[0]
-                 ]
-
-        if debug:
-            print("Saving bug data")
-            data = [i, plots]
-            pklfilehandler = open("pickled_data\\" + "plots_" + str(i) +
-                                  ".pkl",
-                                  'wb')
-            pickle.dump(data, pklfilehandler)
-        bug_stats(i, plots)
-
-        # except:
-        #     print("skipping bug number: ", i)
-        #     continue
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("results_path")
+    parser.add_argument("--metrics", action="store_true",
+                        help="only write the summary metrics of each "
+                             "strategy to metrics.csv")
+    parser.add_argument("--bugs", type=parse_bugs, default=[1],
+                        help='the Lang bugs to evaluate, e.g. "1-65" or '
+                             '"14,21,30"')
+    parser.add_argument("--workers", type=int, default=None,
+                        help="the number of bugs evaluated in parallel")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_DIR,
+                        default=None,
+                        help="a directory where the results of each stage "
+                             "are kept, so that a re-run only computes what "
+                             "changed or was not finished (default {} when "
+                             "given without a directory)".format(
+                                 DEFAULT_CACHE_DIR))
+    parser.add_argument("--store", default=DEFAULT_STORE_DIR,
+                        help="the directory of the result store the curves "
+                             "of each bug are appended to")
+    args = parser.parse_args()
+
+    store = ResultStore(args.store)
+
+    pipeline = partial(evaluate_bug, args.results_path, args.metrics,
+                       NUMBER_OF_TRIALS, args.cache)
+    for run in run_batch(pipeline, args.bugs, args.workers):
+        if run.error is not None:
+            print("skipping bug number:", run.bug)
+            print(run.error)
+        elif args.metrics:
+            append_rows("metrics.csv", METRIC_COLUMNS,
+                        metrics_rows(run.bug, run.result))
+        else:
+            print("Saving bug data", run.bug)
+            start = time.perf_counter()
+            plots = [run.result[name] for name in PLOT_STRATEGIES]
+            store.append(run.bug, {name: run.result[name]
+                                   for name in PLOT_STRATEGIES})
+            bug_stats(run.bug, plots)
+            run.timings["save"] = time.perf_counter() - start
+        print("bug {}: {:.1f}s".format(run.bug, run.timings["total"]))
+        append_rows("timings.csv", TIMING_COLUMNS, timing_rows(run))
@@ -1,19 +1,46 @@
-import random
-from turtle import pd
+import os
+from functools import partial
 from typing import Optional
 
 import matplotlib.pyplot as plt
-import pandas as pd
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 
+from batch_runner import run_batch
 from dominator_mutants import calculate_dominating_mutants
-from graph_tools import total_subsumed_size
-from statistics import import_all_pickles
+from result_store import ResultStore
+from work_simulation import simulate_work
+
+# the legend of each curve drawn by plot, in the order of the curves
+PLOT_NAMES = ["Traditional Mutants -- Best Case (TB)",
+              "Traditional Mutants -- Random (TR)",
+              "Natural Mutants -- Best Case (NB)",
+              "Natural Mutants -- Random (NR)",
+              "Natural Mutants -- Naturalness  (NN)",
+              "All Mutants -- Best Case  (AB)",
+              "All Mutants -- Random (AR)",
+              "All Mutants -- Naturalness (AN)",
+              ]
+
+# the strategies drawn by generate_traditional_plot and their legends
+TRADITIONAL_STRATEGIES = ["traditional_bestcase", "traditional_random",
+                          "traditional_naturalness"]
+TRADITIONAL_PLOT_NAMES = ["Traditional Mutants -- Best Case (TB)",
+                          "Traditional Mutants -- Random (TR)",
+                          "Traditional Mutants -- Naturalness (TN)"]
+
+# the store of the worker process, see _attach_store
+_worker_store = None
 
 
 def generate_eval_plot(sorted_mutants, killmap, rev_killmap,
-                       total_number_of_mutants):
+                       total_number_of_mutants, rng=None):
     """
 
+    See documentation for work_simulation.simulate_work. The arguments are not
+    modified, so they can be reused for other orderings.
+
     :param sorted_mutants: list [int]
             A pre-sorted list of mutant identifiers
     :param killmap: dict[frozenset: set()]
@@ -25,307 +52,245 @@ def generate_eval_plot(sorted_mutants, killmap, rev_killmap,
     :param total_number_of_mutants: int
         The total number of mutants that were generated for this bug for this
         evaluation
-    :return: list[float]
+    :param rng: random.Random or np.random.Generator
+        The source of randomness used to pick tests (default the random
+        module)
+    :return: tuple (list[float], int)
         A list of y-coordinates for the plot points representing work
-        evaluation for a given type of mutants.
+        evaluation for a given type of mutants and the number of mutants
+        killed.
     """
+    return simulate_work(sorted_mutants, killmap, rev_killmap,
+                         total_number_of_mutants, rng)
 
-    mutants_killed_so_far = set()
-    plot: Optional[list[list]] = []
-    plot.append(0)
-
-    killmap_size = len(killmap)
-
-    while True:
-        # check if we are done whether it is by reaching the end or the plot
-        # limit
-
-        # Considers the total number of mutants
-        if len(mutants_killed_so_far) == killmap_size:
-            break
-
-        # for the first mutant on the list of remaining mutants mutant select a test
-        mutant_formatted_in_frozenset = sorted_mutants[0]
-
-        # check whether the mutant was killed
-        if mutant_formatted_in_frozenset in killmap.keys():
-            # randomly select a test from the set off tests that kill that mutant
-            randomly_selected_test = \
-                random.sample(killmap[mutant_formatted_in_frozenset], 1)[0]
-            # popping the key: test that kills all the value: mutant rev_killmap
-            new_kills = rev_killmap.pop(randomly_selected_test)
-            # popping all the mutants killed from killmap
-            for mutant in new_kills:
-                if mutant in killmap:
-                    del killmap[mutant]
-                    sorted_mutants.remove(mutant)
-
-            # Remove the tests from all mutants.
-            # this has to be done in a round about way
-            for mutant in killmap.copy():
-                # get all the remaining tests for that mutant minus the
-                # currently randomly selected test
-                randomly_selected_test_set = set()
-                randomly_selected_test_set.add(randomly_selected_test)
-                temp_mutant_test_set = killmap[mutant].difference(
-                    randomly_selected_test_set)
-
-                # if the test set is empty just break out of this inner loop
-                if temp_mutant_test_set == set():
-                    break
-                # otherwise add the remaining tests back in
-                else:
-                    killmap[mutant] = temp_mutant_test_set
-
-            mutants_killed_so_far = mutants_killed_so_far.union(new_kills)
-            count = 0
-            for mutant in mutants_killed_so_far:
-                count += len(mutant)
-
-            plot.append((count / total_number_of_mutants) * 100)
-        else:
 
-            sorted_mutants = sorted_mutants[1:]
+def draw_curves(ax, plots, plot_names):
+    """Draws test completeness curves on an axes
 
-    return plot, count
+    Parameters:
+        ax: matplotlib.axes.Axes
+            Where the curves are drawn
+        plots: List[List[float]]
+            The y-coordinates of each curve, as percentages; position x of a
+            curve is the work x
+        plot_names: List[str]
+            The legend of each curve
+    """
+    maxi = max(len(curve) for curve in plots)
+    increment = max(int(max(maxi, 1) / 10), 1)
+
+    for curve, name in zip(plots, plot_names):
+        curve = np.asarray(curve, dtype=float)
+        ax.plot(np.arange(len(curve)), curve, label=name)
+
+    ax.set_xticks(range(0, maxi, increment))
+    ax.set_yticks(range(0, 105, 25))
+    ax.tick_params(labelsize=4)
+    ax.margins(x=0)
+    ax.legend()
+    ax.set_xlabel("Work")
+    ax.set_ylabel("Test Completeness")
 
 
-# TODO fix documentation
 # TODO add title for each graph
 def plot(plots):
-    """Plots the test completeness graph
-
+    """Plots the test completeness graph of every strategy on a new pyplot
+    figure
 
     Parameters:
-         plot1: List[tuple(int, int)]
-            A list of plot points that could used to plot test completeness
-            """
-    # traditional_random,
-    # traditional_bestcase,
-    # natural_naturalness[0][0],
-    # natural_bestcase,
-    # natural_random,
-    # all_bestcase,
-    # all_random,
-    # all_naturalness,
-
-    plot_names = ["Traditional Mutants -- Best Case (TB)",
-                  "Traditional Mutants -- Random (TR)",
-                  "Natural Mutants -- Best Case (NB)",
-                  "Natural Mutants -- Random (NR)",
-                  "Natural Mutants -- Naturalness  (NN)",
-                  "All Mutants -- Best Case  (AB)",
-                  "All Mutants -- Random (AR)",
-                  "All Mutants -- Naturalness (AN)",
-                  ]
-
-    plots_info = [pd.DataFrame(data=d, columns=[n]) for n, d in zip(
-        plot_names, plots)]
-    maxi = max(len(i) for i in plots_info)
-    increment = int(max(maxi, 1) / 10)
-    if increment == 0:
-        increment = 1
-
-    # TODO factor out code here
-    ax = plots_info[0].plot(fontsize=4,
-                            xticks=(range(0, maxi, increment)),
-                            yticks=range(0, 105, 25),
-                            legend=False)
-
-    for j in range(1, len(plots_info)):
-        plots_info[j].plot(fontsize=4,
-                           xticks=(range(0, maxi, increment)),
-                           yticks=(range(0, 105, 25)),
-                           legend=False, ax=ax)
-
-    plt.legend()
-    ax.set_xlabel("Work")
-    ax.set_ylabel("Test Completeness")
-
+        plots: List[List[float]]
+            The curve of each strategy, in the order of PLOT_NAMES
+    Returns:
+        plt: The pyplot module, whose current figure holds the graph
+    """
+    draw_curves(plt.figure().add_subplot(), plots, PLOT_NAMES)
     return plt
 
 
-def generate_test_completeness_plot(kill_map):
+def generate_test_completeness_plot(kill_map, plot=None):
     """Generates the test completeness plot
 
     Takes a mapping of mutants to the tests that kill them.
     Calls calculate_dominating_mutants on the given kill_map to store a
     dominator set of mutants.
 
-    get_tests_covered is called on each of the mutants in the dominator
-    set to generate a mapping of each dominator mutant to the set of tests
-    (mutant test set) that kill that mutant.
-
-    For each point plotted (each iteration) the tests that are used in the
-    plot (tests that kill the presented mutant) are subtracted from the
-    remaining mutants' test set. That is, if test t_A kills mutants m1, m2,
-    and m3, once we explore mutant m1 and count test t_A towards one plotted
-    point, we can no longer count it for m2, and m3 in subsequent plotted
-    points.
-
-    After each iteration the remaining mutants are re-sorted based on the
-    number of remaining tests that kill them.
+    The dominator mutants are presented in decreasing order of the number of
+    mutants they subsume (themselves and their descendents, see
+    graph_tools.total_subsumed_size), ties kept in dominator set order. Each
+    point adds the presented dominator and the descendents that no earlier
+    dominator subsumes, so every subsumed mutant is counted once. That is,
+    if m2 is a descendent of both m1 and m3, and m1 is presented first, m2
+    is counted for m1 and no longer for m3.
 
-    The above process is repeated until all dominating mutants are considered.
+    The order is sorted once, and each descendent is claimed by the first
+    dominator that reaches it, so the work is linear in the total size of
+    the descendent sets.
 
     Parameters:
         kill_map: A mapping from a set of identifiers from mutants killed to a
         set of identifiers for tests that kill each mutant.
+        plot: list[float] or CurveMetrics
+            Where the points after the starting 0 are appended (default a new
+            list [0]); a CurveMetrics keeps only the summary metrics
     Returns:
         plot: List[tuple(int, int)]
             A list of plot points that could used to plot test completeness
     """
 
-    # Get the dominator set of mutants and their graph
+    # Get the dominator set of mutants
     result = calculate_dominating_mutants(kill_map)
     dominator_set = result[2]
-    graph = result[0]
-    plot = [0]
+    if plot is None:
+        plot = [0]
 
     dominator_to_subsumed_mapping: Optional[dict()] = dict()
-
+    subsumed_size: Optional[dict()] = dict()
     for dominator_mutant in dominator_set:
-        temp = dominator_mutant.get_descendents()
-        dominator_to_subsumed_mapping[dominator_mutant] = temp
+        descendents = dominator_mutant.get_descendents()
+        dominator_to_subsumed_mapping[dominator_mutant] = descendents
+        subsumed_size[dominator_mutant] = dominator_mutant.size + sum(
+            descendent.size for descendent in descendents)
 
     sorted_dominator_mutants = sorted(dominator_to_subsumed_mapping.keys(),
-                                      key=lambda i:
-                                      total_subsumed_size(i),
-                                      reverse=True)
-
-    # making sure each subsumed mutant is removed once using a triangular
-    # double-loop
-    mutants_considered_so_far: Optional[set()] = set()
-    for dominator_mutant_index in range(0, len(sorted_dominator_mutants) - 1):
-        for dominator_mutant_index2 in range(dominator_mutant_index + 1,
-                                             len(sorted_dominator_mutants)):
-            if dominator_to_subsumed_mapping[sorted_dominator_mutants[
-                dominator_mutant_index2]] != set() and not \
-                    sorted_dominator_mutants[
-                        dominator_mutant_index2] in mutants_considered_so_far:
-                dominator_to_subsumed_mapping[sorted_dominator_mutants[
-                    dominator_mutant_index2]] = \
-                    dominator_to_subsumed_mapping[sorted_dominator_mutants[
-                        dominator_mutant_index2]].difference(
-                        dominator_to_subsumed_mapping[sorted_dominator_mutants[
-                            dominator_mutant_index]])
-
-        # re-sort
-        sorted_dominator_mutants = sorted(dominator_to_subsumed_mapping.keys(),
-                                          key=lambda i:
-                                          total_subsumed_size(i),
-                                          reverse=True)
-        mutants_considered_so_far.add(
-            sorted_dominator_mutants[dominator_mutant_index])
-
-    # we are now guaranteed to have unique subsumed mutants for each dominator
-    # therefore, we can just plot the test completeness
-    # Count the size of each node
+                                      key=subsumed_size.get, reverse=True)
 
+    # Count the size of each dominator and of the descendents it is the
+    # first to subsume
+    mutants_counted_so_far: Optional[set()] = set()
     current_count = 0
     for dominator_mutant in sorted_dominator_mutants:
         current_count += dominator_mutant.size
         for mutant in dominator_to_subsumed_mapping[dominator_mutant]:
-            current_count = current_count + mutant.size
+            if mutant not in mutants_counted_so_far:
+                mutants_counted_so_far.add(mutant)
+                current_count = current_count + mutant.size
         plot.append((current_count / len(kill_map)) * 100)
 
     return plot
 
 
-def plots_all(all_data):
-    for i in range(len(all_data)):
-        graph = plot(all_data[i][1])
-        print("Outputting the graph")
-        graph.savefig("images2\\" + "lang_" + str(i) + ".png", dpi=800)
+def generate_traditional_plot(plots):
+    """Plots the test completeness graph of the traditional mutants on a new
+    pyplot figure
 
+    Parameters:
+        plots: List[List[float]]
+            The curve of each of TRADITIONAL_STRATEGIES
+    Returns:
+        plt: The pyplot module, whose current figure holds the graph
+    """
+    draw_curves(plt.figure().add_subplot(), plots, TRADITIONAL_PLOT_NAMES)
+    return plt
 
-def plot_traditional(all_data):
-    for i in range(len(all_data)):
-        plots = all_data[i][1][0:2]
-        plots.append(all_data[i][1][-1])
-        graph = generate_traditional_plot(plots)
-        print("Outputting the graph")
-        graph.savefig("images2\\" + "lang_traditonal_" + str(i) + ".png",
-                      dpi=800)
 
+def _attach_store(store_dir):
+    """ Worker initializer: opens the store once per worker process """
+    global _worker_store
+    _worker_store = ResultStore(store_dir)
 
-# TODO add documentation
-def generate_traditional_plot(plots):
-    """Plots the test completeness graph
-
-
-        Parameters:
-             plot1: List[tuple(int, int)]
-                A list of plot points that could used to plot test completeness
-                """
-    # traditional_random,
-    # traditional_bestcase,
-    # natural_naturalness[0][0],
-    # natural_bestcase,
-    # natural_random,
-    # all_bestcase,
-    # all_random,
-    # all_naturalness,
-
-    plot_names = ["Traditional Mutants -- Best Case (TB)",
-                  "Traditional Mutants -- Random (TR)",
-                  "Traditional Mutants -- Naturalness (TN)"]
-
-    plots_info = [pd.DataFrame(data=d, columns=[n]) for n, d in zip(
-        plot_names, plots)]
-    maxi = max(len(i) for i in plots_info)
-    increment = int(max(maxi, 1) / 10)
-    if increment == 0:
-        increment = 1
-
-    # TODO factor out code here
-    ax = plots_info[0].plot(fontsize=4,
-                            xticks=(range(0, maxi, increment)),
-                            yticks=range(0, 105, 25),
-                            legend=False)
-
-    for j in range(1, len(plots_info)):
-        plots_info[j].plot(fontsize=4,
-                           xticks=(range(0, maxi, increment)),
-                           yticks=(range(0, 105, 25)),
-                           legend=False, ax=ax)
-        # y1 = plots_info[0]
-        # y2 = plots_info[1]
-        # y3 = plots_info[2]
-
-    plt.legend()
-    ax.set_xlabel("Work")
-    ax.set_ylabel("Test Completeness")
-    plt.show()
 
-    return plt
+def render_bug(store, strategies, plot_names, prefix, dpi, bug,
+               timings=None):
+    """Renders the graph of one bug to a PNG file
+
+    The graph is drawn on its own Figure with the Agg canvas, so no window
+    is opened and nothing is shared with pyplot or with other bugs.
+
+    Parameters:
+        store: ResultStore
+            The curves of the bugs (None in a worker process of render_bugs,
+            which reads the store opened by _attach_store)
+        strategies: List[str]
+            The strategies drawn (None for every stored strategy)
+        plot_names: List[str]
+            The legend of each curve, in the order of the curves
+        prefix: str
+            The path of the image, up to the bug number
+        dpi: int
+            The resolution of the image
+        bug: int
+            The bug number
+        timings: dict[str: float]
+            Unused, see batch_runner.run_bug
+    Returns:
+        filename: str
+            The path of the image
+    """
+    if store is None:
+        store = _worker_store
+    curves = store.load([bug], strategies)[bug]
+    if not curves:
+        raise ValueError("No curves stored for bug {}".format(bug))
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    draw_curves(figure.add_subplot(), list(curves.values()), plot_names)
+    filename = prefix + str(bug) + ".png"
+    figure.savefig(filename, dpi=dpi)
+    return filename
+
+
+def render_bugs(store, bugs=None, strategies=None, plot_names=PLOT_NAMES,
+                prefix="images2\\lang_", dpi=800, workers=None):
+    """Renders the graph of each bug, see render_bug. A bug that fails is
+    reported and skipped
+
+    Parameters:
+        store: ResultStore
+            The curves of the bugs
+        bugs: List[int]
+            The bugs rendered (default every stored bug)
+        workers: int
+            The number of worker processes (default None, render in this
+            process)
+    Returns:
+        filenames: List[str]
+            The paths of the images, in the order they are rendered
+    """
+    if bugs is None:
+        bugs = store.bugs()
+    if workers is None:
+        function = partial(render_bug, store, strategies, plot_names, prefix,
+                           dpi)
+        runs = run_batch(function, bugs)
+    else:
+        # each worker process opens the store and reads its index once
+        function = partial(render_bug, None, strategies, plot_names, prefix,
+                           dpi)
+        runs = run_batch(function, bugs, workers, _attach_store,
+                         (store.store_dir,))
+    filenames: Optional[list] = list()
+    for run in runs:
+        if run.error is not None:
+            print("skipping bug number:", run.bug)
+            print(run.error)
+        else:
+            print("Outputting the graph", run.result)
+            filenames.append(run.result)
+    return filenames
+
+
+def plots_all(store, bugs=None, workers=None):
+    return render_bugs(store, bugs, workers=workers)
 
 
-def plot_natural(all_data):
-    for i in range(len(all_data)):
-        graph = plot(all_data[i][1])
-        print("Outputting the graph")
-        graph.savefig("images2\\" + "lang_" + str(i) + ".png", dpi=800)
+def plot_traditional(store, bugs=None, workers=None):
+    return render_bugs(store, bugs, TRADITIONAL_STRATEGIES,
+                       TRADITIONAL_PLOT_NAMES, "images2\\lang_traditonal_",
+                       workers=workers)
 
 
-def plots_all(all_data):
-    for i in range(len(all_data)):
-        graph = plot(all_data[i][1])
-        print("Outputting the graph")
-        graph.savefig("images2\\" + "lang_" + str(i) + ".png", dpi=800)
+def plot_natural(store, bugs=None, workers=None):
+    return render_bugs(store, bugs, workers=workers)
 
 
-def plot_all(all_data):
-    for i in range(len(all_data)):
-        graph = plot(all_data[i][1])
-        print("Outputting the graph")
-        graph.savefig("images2\\" + "lang_" + str(i) + ".png", dpi=800)
+def plot_all(store, bugs=None, workers=None):
+    return render_bugs(store, bugs, workers=workers)
 
 
 if __name__ == "__main__":
-    all_data = import_all_pickles()
-    # plots_all(all_data)
-    plot_traditional(all_data)
-    # plot_natural(all_data)
-    # plot_all(all_data)
+    store = ResultStore()
+    # plots_all(store)
+    plot_traditional(store, workers=os.cpu_count())
+    # plot_natural(store)
+    # plot_all(store)
     print("test")
@@ -0,0 +1,153 @@
+import os
+import re
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+# where naturalworkevaluation stores the curves and plot_tools reads them
+DEFAULT_STORE_DIR = "result_store"
+
+_SEGMENT_PATTERN = re.compile(r"^segment_(\d+)\.npz$")
+
+
+def _atomic_save(filename, save):
+    """ Writes a file through a temporary file renamed over it, so readers
+    never see a partial file
+
+    :param filename: str
+    :param save: Callable[[file], None]
+                Writes the contents to the open binary file
+    """
+    handle, temp_file = tempfile.mkstemp(dir=os.path.dirname(filename),
+                                         suffix=".tmp")
+    try:
+        with os.fdopen(handle, 'wb') as fo:
+            save(fo)
+        os.replace(temp_file, filename)
+    except Exception:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+
+class ResultStore:
+    """ The curves of the strategies of many bugs, stored by column
+
+    The store is a directory of segments, one per append. A segment is made
+    of an index, the bug, strategy, offset and length columns of its curves
+    (segment_<n>.npz), and of the values of all its curves end to end
+    (segment_<n>.npy). Loading only reads the indexes and memory-maps the
+    values, so only the curves of the selected bugs and strategies are read
+    from disk. A curve appended again for the same bug and strategy replaces
+    the earlier one.
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR):
+        """
+        :param store_dir: str
+                    The directory of the segments
+        """
+        self.store_dir = store_dir
+        self._index = None
+
+    def _segment_numbers(self):
+        if not os.path.isdir(self.store_dir):
+            return list()
+        return sorted(int(match.group(1)) for match in
+                      map(_SEGMENT_PATTERN.match, os.listdir(self.store_dir))
+                      if match)
+
+    def _segment_path(self, number):
+        return os.path.join(self.store_dir, "segment_{:06d}".format(number))
+
+    def append(self, bug, results):
+        """ Adds the curves of one bug as a new segment
+
+        :param bug: int
+                    The bug number
+        :param results: dict[str: list[float] or np.ndarray]
+                    The curve of each strategy, see evaluate_strategies
+        """
+        names = list(results)
+        curves = [np.asarray(results[name], dtype=np.float64).ravel()
+                  for name in names]
+        lengths = np.array([len(curve) for curve in curves], dtype=np.int64)
+        offsets = np.cumsum(lengths) - lengths
+        values = np.concatenate(curves) if curves else np.zeros(0)
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        numbers = self._segment_numbers()
+        segment = self._segment_path(numbers[-1] + 1 if numbers else 0)
+        # the index is written last: a segment without one is ignored
+        _atomic_save(segment + ".npy", lambda fo: np.save(fo, values))
+        _atomic_save(segment + ".npz", lambda fo: np.savez(
+            fo, bug=np.full(len(names), bug, dtype=np.int64),
+            strategy=np.array(names, dtype=str), offset=offsets,
+            length=lengths))
+        self._index = None
+
+    def index(self):
+        """
+        :return: dict[int: dict[str: tuple (str, int, int)]]
+                    The values file, offset and length of the latest curve of
+                    each strategy of each bug, bugs in the order they were
+                    first appended
+        """
+        if self._index is None:
+            index: Optional[dict] = dict()
+            for number in self._segment_numbers():
+                segment = self._segment_path(number)
+                with np.load(segment + ".npz") as columns:
+                    for bug, name, offset, length in zip(
+                            columns["bug"], columns["strategy"],
+                            columns["offset"], columns["length"]):
+                        index.setdefault(int(bug), dict())[str(name)] = \
+                            (segment + ".npy", int(offset), int(length))
+            self._index = index
+        return self._index
+
+    def bugs(self):
+        """
+        :return: list[int]
+                    The stored bugs, in increasing order
+        """
+        return sorted(self.index())
+
+    def iter_results(self, bugs=None, strategies=None):
+        """ Reads the curves of the selected bugs, one bug at a time
+
+        :param bugs: Iterable[int]
+                    The bugs to read (default every stored bug, see bugs)
+        :param strategies: list[str]
+                    The strategies to read (default every stored strategy of
+                    each bug, in the order they were appended)
+        :return: Iterator[tuple (int, dict[str: np.ndarray])]
+                    Each bug and the curve of each of its selected strategies
+                    that is stored, in the order of strategies
+        """
+        index = self.index()
+        if bugs is None:
+            bugs = self.bugs()
+        for bug in bugs:
+            # the values files of one bug are mapped while it is read
+            values: Optional[dict] = dict()
+            entries = index.get(bug, dict())
+            names = list(entries) if strategies is None else \
+                [name for name in strategies if name in entries]
+            curves: Optional[dict] = dict()
+            for name in names:
+                filename, offset, length = entries[name]
+                if filename not in values:
+                    values[filename] = np.load(filename, mmap_mode='r')
+                curves[name] = np.array(values[filename][offset:
+                                                         offset + length])
+            yield bug, curves
+
+    def load(self, bugs=None, strategies=None):
+        """ Reads the curves of the selected bugs, see iter_results
+
+        :return: dict[int: dict[str: np.ndarray]]
+                    The curve of each selected strategy of each bug
+        """
+        return dict(self.iter_results(bugs, strategies))
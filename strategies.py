@@ -0,0 +1,540 @@
+import csv
+import hashlib
+import os.path
+import time
+from collections import namedtuple
+from functools import partial
+from typing import Optional
+
+import numpy as np
+
+from artifact_cache import file_digest
+from dominator_mutants import convert_csv_to_killmap, \
+    convert_killmap_to_unique_killmap, merge_killmaps
+from naturalness_tools import NATURAL_MUTANT_OFFSET, \
+    NATURALNESS_CACHE_VERSION, combine_mapping, \
+    generate_mutant_to_token_mapping, generate_scores, \
+    load_naturalness_scores, rank_by_naturalness
+from plot_tools import generate_test_completeness_plot
+from trial_runner import aggregate_trials, summarize_trials
+from work_simulation import CurveMetrics, KillMatrix, simulate_ordering
+
+MUTANT_TYPES = ("traditional-mutants", "natural-mutants", "all-mutants")
+
+# kind is "ordering" (function(context, matrix) returns the group indices in
+# the order they are presented), "random" (uniformly random orderings,
+# function is None) or "curve" (function(context, plot=None) appends the
+# points after the starting 0 to plot, a list by default, and returns it).
+# version is part of the key of the strategy's cached results, bump it when
+# the strategy changes. inputs names the input files (see INPUT_NAMES) the
+# strategy reads besides the kill maps of its mutant type
+Strategy = namedtuple("Strategy", ["mutant_type", "kind", "function",
+                                   "version", "inputs"])
+
+STRATEGIES: Optional[dict] = dict()
+
+# the input files of a bug, see BugContext.input_files
+INPUT_NAMES = ("traditional_killmap", "natural_killmap",
+               "traditional_naturalness", "mutants_log", "mml_confidence")
+
+# the kill map input files read for each of MUTANT_TYPES
+KILLMAP_INPUTS = {"traditional-mutants": ("traditional_killmap",),
+                  "natural-mutants": ("natural_killmap",),
+                  "all-mutants": ("traditional_killmap", "natural_killmap")}
+
+
+def register_strategy(name, mutant_type, kind, function=None, version=1,
+                      inputs=()):
+    """ Adds an evaluation strategy to STRATEGIES
+
+    :param name: str
+                The name of the strategy
+    :param mutant_type: str
+                One of MUTANT_TYPES
+    :param kind: str
+                "ordering", "random" or "curve", see Strategy
+    :param function: Callable
+                The ordering or curve function of the strategy
+    :param version: int
+                The version of the strategy, see Strategy
+    :param inputs: tuple[str]
+                The input files the strategy reads besides the kill maps,
+                see Strategy
+    :return: Strategy
+                The registered strategy
+    """
+    if mutant_type not in MUTANT_TYPES:
+        raise ValueError("Unknown mutant type: {}".format(mutant_type))
+    if kind not in ("ordering", "random", "curve"):
+        raise ValueError("Unknown strategy kind: {}".format(kind))
+    if (function is None) != (kind == "random"):
+        raise ValueError("Only random strategies have no function: {}".format(
+            name))
+    for input_name in inputs:
+        if input_name not in INPUT_NAMES:
+            raise ValueError("Unknown input file: {}".format(input_name))
+    strategy = Strategy(mutant_type, kind, function, version, tuple(inputs))
+    STRATEGIES[name] = strategy
+    return strategy
+
+
+def ordering_strategy(name, mutant_type, version=1, inputs=()):
+    """ Decorator registering an ordering function as a strategy
+
+    :param name: str
+                The name of the strategy
+    :param mutant_type: str
+                One of MUTANT_TYPES
+    :param version: int
+                The version of the strategy, see Strategy
+    :param inputs: tuple[str]
+                The input files the ordering reads, see Strategy
+    """
+    def register(function):
+        register_strategy(name, mutant_type, "ordering", function, version,
+                          inputs)
+        return function
+    return register
+
+
+def load_killmaps(results_dir):
+    """ Loads the kill maps of every type of mutants of a bug, reading each
+    killMap.csv only once
+
+    :param results_dir: str
+                        The directory containing the results files from
+                        tailored mutant data
+    :return: dict[str: dict[frozenset: set()]]
+                        The kill map of each of MUTANT_TYPES. The
+                        "all-mutants" kill map merges both, with the natural
+                        mutants offset by NATURAL_MUTANT_OFFSET, see
+                        documentation for natural_offset_killmap
+    """
+    killmaps: Optional[dict] = dict()
+    for type in MUTANT_TYPES[:2]:
+        dirpath = results_dir + "\\" + type + "\\non-triggering"
+        killmaps[type] = convert_csv_to_killmap(
+            os.path.join(dirpath, "killMap.csv"))
+    killmaps["all-mutants"] = merge_killmaps(killmaps["traditional-mutants"],
+                                             killmaps["natural-mutants"],
+                                             NATURAL_MUTANT_OFFSET)
+    return killmaps
+
+
+def killmaps_digest(killmaps):
+    """ Hashes kill maps independently of the order of their entries
+
+    :param killmaps: dict[str: dict[frozenset: set()]]
+                        The kill map of each type of mutants
+    :return: str
+                        The hexadecimal SHA-256 digest of the kill maps
+    """
+    digest = hashlib.sha256()
+    for mutant_type in sorted(killmaps):
+        entries = sorted((sorted(map(repr, mutants)), sorted(map(repr, tests)))
+                         for mutants, tests in killmaps[mutant_type].items())
+        digest.update(repr((mutant_type, entries)).encode())
+    return digest.hexdigest()
+
+
+class BugContext:
+    """ The data of one bug shared by every strategy
+
+    Each structure is loaded the first time a strategy asks for it and then
+    kept, so evaluating many strategies reads every input file once. With an
+    ArtifactCache, the kill maps, kill matrices and naturalness scores are
+    also memoized on disk, each keyed by the digests of the input files it
+    is built from (or by the digest of the kill map itself when the kill
+    maps are given), so changing one input file only rebuilds what depends
+    on it.
+    """
+
+    def __init__(self, results_dir, killmaps=None, cache=None):
+        """
+        :param results_dir: str
+                        The directory containing the results files from
+                        tailored mutant data
+        :param killmaps: dict[str: dict[frozenset: set()]]
+                        The kill maps of the bug, by mutant type (default
+                        loaded from the killMap.csv files when first needed)
+        :param cache: ArtifactCache
+                        Where loaded structures and strategy results are
+                        memoized (default None, no memoization)
+        """
+        self.results_dir = results_dir
+        self.cache = cache
+        self._given_killmaps = killmaps
+        self._killmaps: Optional[dict] = dict(killmaps or dict())
+        self._matrices: Optional[dict] = dict()
+        self._naturalness_scores = None
+        self._input_digests: Optional[dict] = dict()
+
+    def input_files(self):
+        """
+        :return: dict[str: str]
+                        The path of every input file of the bug the
+                        strategies may read, by name (see INPUT_NAMES)
+        """
+        traditional = self.results_dir + \
+            "\\traditional-mutants\\non-triggering"
+        natural = self.results_dir + "\\natural-mutants\\non-triggering"
+        natural_scores = self.results_dir + "natural-mutants\\non-triggering"
+        return {"traditional_killmap": os.path.join(traditional,
+                                                    "killMap.csv"),
+                "natural_killmap": os.path.join(natural, "killMap.csv"),
+                "traditional_naturalness": os.path.join(
+                    traditional + "\\", "traditional_naturalness.csv"),
+                "mutants_log": os.path.join(natural_scores, "mutants.log"),
+                "mml_confidence": os.path.join(natural_scores,
+                                               "mml_confidence_data.csv")}
+
+    def input_digests(self, input_names):
+        """
+        :param input_names: Iterable[str]
+                        Names of input files, see input_files
+        :return: tuple[str]
+                        The digest of each of the files, see file_digest;
+                        each file is hashed once
+        """
+        for input_name in input_names:
+            if input_name not in self._input_digests:
+                self._input_digests[input_name] = file_digest(
+                    self.input_files()[input_name])
+        return tuple(self._input_digests[input_name]
+                     for input_name in input_names)
+
+    def killmap_digests(self, mutant_type):
+        """
+        :param mutant_type: str
+                        One of MUTANT_TYPES
+        :return: tuple[str]
+                        The digests the kill map of that type is built from:
+                        its killMap.csv files (see KILLMAP_INPUTS), or
+                        killmaps_digest of the given kill map
+        """
+        if self._given_killmaps is not None and \
+                mutant_type in self._given_killmaps:
+            return (killmaps_digest(
+                {mutant_type: self._given_killmaps[mutant_type]}),)
+        return self.input_digests(KILLMAP_INPUTS[mutant_type])
+
+    def strategy_digests(self, strategy):
+        """
+        :param strategy: Strategy
+        :return: tuple[str]
+                        The digests of every input the strategy reads: the
+                        kill map of its mutant type and its own inputs
+        """
+        return self.killmap_digests(strategy.mutant_type) + \
+            self.input_digests(strategy.inputs)
+
+    def memoize(self, stage, key, compute):
+        """ Returns compute(), memoized in the cache when there is one
+
+        :param stage: str
+        :param key: tuple
+        :param compute: Callable[[], object]
+                        See documentation for ArtifactCache.get_or_compute
+        :return: object
+        """
+        if self.cache is None:
+            return compute()
+        return self.cache.get_or_compute(stage, key, compute)
+
+    def killmap(self, mutant_type):
+        """
+        :param mutant_type: str
+                        One of MUTANT_TYPES
+        :return: dict[frozenset: set()]
+                        The kill map of the mutants of that type. The
+                        "all-mutants" kill map merges the other two, with the
+                        natural mutants offset by NATURAL_MUTANT_OFFSET, see
+                        documentation for natural_offset_killmap
+        """
+        if mutant_type not in self._killmaps:
+            if mutant_type == "all-mutants":
+                killmap = merge_killmaps(
+                    self.killmap("traditional-mutants"),
+                    self.killmap("natural-mutants"), NATURAL_MUTANT_OFFSET)
+            else:
+                filename = self.input_files()[KILLMAP_INPUTS[mutant_type][0]]
+                killmap = self.memoize(
+                    "killmap", self.killmap_digests(mutant_type),
+                    partial(convert_csv_to_killmap, filename))
+            self._killmaps[mutant_type] = killmap
+        return self._killmaps[mutant_type]
+
+    def matrix(self, mutant_type):
+        """
+        :param mutant_type: str
+                        One of MUTANT_TYPES
+        :return: KillMatrix
+                        The read-only kill matrix of the unique kill map of
+                        the mutants of that type
+        """
+        if mutant_type not in self._matrices:
+            self._matrices[mutant_type] = self.memoize(
+                "kill_matrix", self.killmap_digests(mutant_type) +
+                (mutant_type,),
+                lambda: KillMatrix(convert_killmap_to_unique_killmap(
+                    self.killmap(mutant_type))))
+        return self._matrices[mutant_type]
+
+    def naturalness_scores(self):
+        """
+        :return: dict[int: float[]]
+                        The naturalness scores of the natural mutants, see
+                        documentation for combine_mapping. With an
+                        ArtifactCache they are memoized there; without one,
+                        load_naturalness_scores keeps them in its own cache
+        """
+        if self._naturalness_scores is None:
+            files = self.input_files()
+            log_file, mml_csv = files["mutants_log"], files["mml_confidence"]
+            if self.cache is None:
+                self._naturalness_scores = load_naturalness_scores(log_file,
+                                                                   mml_csv)
+            else:
+                self._naturalness_scores = self.memoize(
+                    "naturalness_scores",
+                    self.input_digests(("mutants_log", "mml_confidence")) +
+                    (NATURALNESS_CACHE_VERSION,),
+                    lambda: combine_mapping(
+                        generate_mutant_to_token_mapping(log_file),
+                        generate_scores(mml_csv)))
+        return self._naturalness_scores
+
+
+def strategy_seed_sequence(seed, name):
+    """ The random stream of a strategy
+
+    The stream only depends on the seed and the name of the strategy (which
+    is hashed into the spawn key), never on the other strategies evaluated
+    with it or on their order.
+
+    :param seed: np.random.SeedSequence
+                The seed of the evaluation
+    :param name: str
+                The name of the strategy
+    :return: np.random.SeedSequence
+    """
+    name_key = int.from_bytes(
+        hashlib.sha256(name.encode()).digest()[:8], "little")
+    return np.random.SeedSequence(seed.entropy,
+                                  spawn_key=seed.spawn_key + (name_key,))
+
+
+def evaluate_strategies(context, names=None, number_of_trials=10, seed=None,
+                        workers=None, metrics=False, timings=None):
+    """ Evaluates strategies on one bug, sharing the loaded data
+
+    Ordering strategies are simulated once with simulate_ordering, random
+    strategies are averaged over number_of_trials random orderings with
+    aggregate_trials and curve strategies return their own curve. Each
+    strategy gets its own random stream, derived from seed and its name (see
+    strategy_seed_sequence), so adding, removing or reordering strategies
+    does not change the results of the others.
+
+    In metrics mode, the curves are not kept: the points of ordering and
+    curve strategies go to a CurveMetrics, and random strategies report the
+    mean metrics of their trials (see summarize_trials).
+
+    When the context has an ArtifactCache, the result of each strategy is
+    memoized, keyed by the strategy name and version, the digests of the
+    input files the strategy reads (see BugContext.strategy_digests), the
+    number of trials, the seed and the mode. Re-running with the same seed
+    only computes new or changed strategies and the strategies whose inputs
+    changed, and an interrupted batch resumes after the last stored
+    result. Without a seed, the random streams differ on every run, so
+    nothing is reused.
+
+    :param context: BugContext
+                The data of the bug
+    :param names: list[str]
+                The names of the strategies (default all of STRATEGIES)
+    :param number_of_trials: int
+                The number of random orderings of random strategies
+    :param seed: int
+                The seed of the random streams (default fresh entropy)
+    :param workers: int
+                The number of worker processes of random strategies, see
+                documentation for iter_trial_chunks
+    :param metrics: bool
+                Whether to return summary metrics instead of curves
+    :param timings: dict[str: float]
+                Where the seconds spent on each strategy (including the data
+                it is the first to load) are recorded, by strategy name
+    :return: dict[str: list[float]] or dict[str: dict[str: float]]
+                The curve, or the summary metrics (see CurveMetrics.summary),
+                of each strategy
+    """
+    if names is None:
+        names = list(STRATEGIES)
+    seed = np.random.SeedSequence(seed)
+
+    results: Optional[dict] = dict()
+    for name in names:
+        start = time.perf_counter()
+        strategy = STRATEGIES[name]
+        seed_sequence = strategy_seed_sequence(seed, name)
+        key = (name, strategy.version, context.strategy_digests(strategy),
+               number_of_trials, seed_sequence.entropy,
+               seed_sequence.spawn_key, metrics) \
+            if context.cache is not None else None
+        results[name] = context.memoize(
+            "strategy", key,
+            partial(evaluate_strategy, context, strategy, number_of_trials,
+                    seed_sequence, workers, metrics))
+        if timings is not None:
+            timings[name] = time.perf_counter() - start
+    return results
+
+
+def evaluate_strategy(context, strategy, number_of_trials, seed_sequence,
+                      workers=None, metrics=False):
+    """ Evaluates one strategy on one bug, see evaluate_strategies
+
+    :param context: BugContext
+    :param strategy: Strategy
+    :param number_of_trials: int
+    :param seed_sequence: np.random.SeedSequence
+                The random stream of the strategy
+    :param workers: int
+    :param metrics: bool
+    :return: list[float] or dict[str: float]
+                The curve, or the summary metrics, of the strategy
+    """
+    plot = CurveMetrics() if metrics else None
+    if strategy.kind == "curve":
+        plot = strategy.function(context, plot=plot)
+    elif strategy.kind == "random":
+        matrix = context.matrix(strategy.mutant_type)
+        if metrics:
+            return summarize_trials(matrix, number_of_trials, seed_sequence,
+                                    workers)
+        return aggregate_trials(matrix, number_of_trials, seed_sequence,
+                                workers).mean
+    else:
+        matrix = context.matrix(strategy.mutant_type)
+        order = strategy.function(context, matrix)
+        plot = simulate_ordering(matrix, order,
+                                 np.random.default_rng(seed_sequence),
+                                 plot)[0]
+    return plot.summary() if metrics else plot
+
+
+# the columns of a metrics table, see metrics_rows
+METRIC_COLUMNS = ["Bug", "Strategy", "work", "final", "auc", "work_to_50",
+                  "work_to_80", "work_to_100"]
+
+
+def metrics_rows(bug, results):
+    """ Turns the metrics of evaluate_strategies into metrics table rows
+
+    :param bug: int
+                The bug number
+    :param results: dict[str: dict[str: float]]
+                The summary metrics of each strategy
+    :return: list[list]
+                One row per strategy, in the order of METRIC_COLUMNS
+    """
+    return [[bug, name] + [summary[column] for column in METRIC_COLUMNS[2:]]
+            for name, summary in results.items()]
+
+
+@ordering_strategy("natural_naturalness", "natural-mutants",
+                   inputs=("mutants_log", "mml_confidence"))
+def naturalness_order(context, matrix):
+    """ Orders the groups of natural mutants by naturalness
+
+    The naturalness scores of the natural mutants that are in the kill
+    matrix are ranked by their log ratio, see documentation for
+    rank_by_naturalness
+
+    :param context: BugContext
+                        The data of the bug
+    :param matrix: KillMatrix
+                        The kill matrix of the natural mutants
+    :return: list[int]
+                        The ordered group indices
+    """
+    # Filter the naturalness scores for mutants only in the killmap
+    filtererd_mutant_to_scores_mapping: Optional[dict] = dict()
+    for mutant, scores in context.naturalness_scores().items():
+        group = matrix.mutant_index.get(mutant)
+        if group is not None:
+            filtererd_mutant_to_scores_mapping[group] = scores
+
+    return rank_by_naturalness(
+        filtererd_mutant_to_scores_mapping)["log_ratio"]
+
+
+@ordering_strategy("traditional_naturalness", "traditional-mutants",
+                   inputs=("traditional_naturalness",))
+def traditional_naturalness_order(context, matrix):
+    """ Orders the groups of traditional mutants by naturalness
+
+    The order of the mutants is read from traditional_naturalness.csv. Each
+    listed mutant is mapped to its group of indistinguishable mutants with
+    the mutant to group index, and the groups are collected in an
+    insertion-ordered dictionary, so the ordering is built in linear time.
+
+    :param context: BugContext
+                        The data of the bug
+    :param matrix: KillMatrix
+                        The kill matrix of the traditional mutants
+    :return: list[int]
+                        The ordered group indices
+    """
+    # get the sorted list of mutants
+    csv_filename = context.input_files()["traditional_naturalness"]
+    with open(csv_filename, newline='') as File:
+        # a dict used as an insertion-ordered set of groups
+        sorted_groups: Optional[dict] = dict()
+        reader = csv.reader(File)
+        readerSize = csv.reader(File)
+
+        # # skipping the header
+        # next(reader)
+        empty_csv_check = next(readerSize, "empty")
+        if empty_csv_check != "empty" and len(empty_csv_check) == 1:
+
+            for k, _, _ in reader:
+                # converting to integers
+                group = matrix.mutant_index.get(int(k))
+                if group is not None:
+                    sorted_groups.setdefault(group)
+
+    return list(sorted_groups)
+
+
+def bestcase_curve(context, mutant_type, plot=None):
+    """ The best case curve of one type of mutants of a bug, see
+    documentation for generate_test_completeness_plot
+
+    :param context: BugContext
+                        The data of the bug
+    :param mutant_type: str
+                        One of MUTANT_TYPES
+    :param plot: list[float] or CurveMetrics
+                        Where the points after the starting 0 are appended
+    :return: list[int] or CurveMetrics
+                        The best case test completeness curve
+    """
+    return generate_test_completeness_plot(context.killmap(mutant_type),
+                                           plot)
+
+
+def register_builtin_strategies():
+    """ Adds the best case and random strategies of every type of mutants
+    to STRATEGIES; the naturalness strategies are registered by their
+    decorators
+    """
+    for mutant_type, prefix in zip(MUTANT_TYPES,
+                                   ("traditional", "natural", "all")):
+        register_strategy(prefix + "_bestcase", mutant_type, "curve",
+                          partial(bestcase_curve, mutant_type=mutant_type))
+        register_strategy(prefix + "_random", mutant_type, "random")
+
+
+register_builtin_strategies()
@@ -1,8 +1,10 @@
+import heapq
+
 import matplotlib.pyplot as plt
 import pandas as pd
 
 from dominator_mutants import calculate_dominating_mutants, \
-    convert_csv_to_killmap
+    convert_csv_to_killmap, count_tests
 
 
 def generate_test_completeness_plot(kill_map):
@@ -12,19 +14,23 @@ def generate_test_completeness_plot(kill_map):
     Calls calculate_dominating_mutants on the given kill_map to store a
     dominator set of mutants.
 
-    get_tests_covered is called on each of the mutants in the dominator
-    set to generate a mapping of each dominator mutant to the set of tests
-    (mutant test set) that kill that mutant.
+    tests_covered_all is called on the graph to generate a mapping of each
+    dominator mutant to the set of tests (mutant test set) that kill that
+    mutant.
 
-    For each point plotted (each iteration) the tests that are used in the
-    plot (tests that kill the presented mutant) are subtracted from the
-    remaining mutants' test set. That is, if test t_A kills mutants m1, m2,
-    and m3, once we explore mutant m1 and count test t_A towards one plotted
-    point, we can no longer count it for m2, and m3 in subsequent plotted
-    points.
+    For each point plotted (each iteration) the dominator mutant that covers
+    the most tests not covered so far is presented, ties going to the
+    earliest mutant of the dominator set. That is, if test t_A kills mutants
+    m1, m2, and m3, once we explore mutant m1 and count test t_A towards one
+    plotted point, we can no longer count it for m2, and m3 in subsequent
+    plotted points.
 
-    After each iteration the remaining mutants are re-sorted based on the
-    number of remaining tests that kill them.
+    The sets of tests are int bitsets (one bit per test) and the mutants are
+    kept in a heap keyed by (-gain, position) with possibly stale gains.
+    Gains only shrink as tests are covered, so a popped mutant whose gain is
+    still current is the best one; otherwise it is pushed back with its
+    current gain. Only the mutants near the top of the heap are re-evaluated
+    in each iteration.
 
     The above process is repeated until all dominating mutants are considered.
 
@@ -42,49 +48,33 @@ def generate_test_completeness_plot(kill_map):
     graph = result[0]
     plot = [(0, 0)]
 
-    # Initialize a a dictionary to keep track of test completeness
-    test_completeness_dict = dict()
-
-    # Add dominator mutants and their covered tests to the list
-    # Create a mapping of mutant -> {tests}
-    for mutants in dominator_set:
-        test_completeness_dict[mutants.mutant_identifier] = \
-            graph.get_tests_covered(mutants)
-
-    # Create a sorted list of dominator mutants based on the number of tests
-    # they cover
-
-    tests_added_plotted_so_far = set()
-
-    # Add its tests so far to the list
-    for mutants_counter in (range(len(test_completeness_dict.copy().items()))):
-        # 1.3 generate new sorted list (resort list)
-        sorted_list = sorted(test_completeness_dict,
-                             key=lambda k: len(test_completeness_dict[k]),
-                             reverse=True)
+    # Map each dominator mutant to the bitset of the tests it covers
+    tests_covered = graph.tests_covered_all()[1]
+    covered_tests = [tests_covered[mutants] for mutants in dominator_set]
+
+    heap = [(-count_tests(tests), position)
+            for position, tests in enumerate(covered_tests)]
+    heapq.heapify(heap)
+
+    tests_added_plotted_so_far = 0
+    number_of_tests_plotted = 0
+    for mutants_counter in range(len(covered_tests)):
+        while True:
+            stale_gain, position = heapq.heappop(heap)
+            gain = count_tests(covered_tests[position] &
+                               ~tests_added_plotted_so_far)
+            if gain == -stale_gain:
+                break
+            heapq.heappush(heap, (-gain, position))
 
         # Add the tests from the latest mutant to the set of tests already
         # visited
-
-        tests_added_plotted_so_far = tests_added_plotted_so_far.union(
-            test_completeness_dict.get(
-                sorted_list[0]))
+        tests_added_plotted_so_far |= covered_tests[position]
+        number_of_tests_plotted += gain
 
         # Add new point to the plot using the x = muntants counter and
         # y = len(# tests) as
-
-        plot.append((mutants_counter + 1, len(tests_added_plotted_so_far)))
-
-        # Remove tests added so far from the rest of the list (DO need to
-        # use a for loop inside this for loop for the rest of the mutants on the
-        # list)
-
-        for other_mutants in range(1, len(sorted_list)):
-            temp = test_completeness_dict.get(sorted_list[other_mutants])
-            temp = temp - tests_added_plotted_so_far
-            test_completeness_dict[sorted_list[other_mutants]] = temp
-        # Remove the current mutant from the dict
-        test_completeness_dict.pop(sorted_list[0])
+        plot.append((mutants_counter + 1, number_of_tests_plotted))
 
     return plot
 
@@ -1,8 +1,24 @@
+import os
+import random
+import tempfile
 import unittest
+from unittest import mock
 
+import numpy as np
+
+import artifact_cache
+import batch_runner
+import benchmark_naturalness
 import dominator_mutants
+import dominator_set_writer
+import naturalness_tools
+import plot_tools
+import result_store
+import strategies
 import test_completeness
+import trial_runner
 import txt_to_dominator_mutants
+import work_simulation
 
 
 class TestCase(unittest.TestCase):
@@ -1244,6 +1260,217 @@ class TestCase(unittest.TestCase):
 
         self.assertEqual(result2, result3[1])
 
+    def test_dominant_mutant_txt_single_pass_matches_graph(self):
+        result = txt_to_dominator_mutants.import_mutant_relation(
+            "test-data/groups_test0.txt")
+        expected = txt_to_dominator_mutants.generate_dominator_mutants(
+            result[0], result[1])
+        streamed = txt_to_dominator_mutants. \
+            generate_dominator_mutants_from_txt("test-data/groups_test0.txt")
+
+        self.assertEqual(expected, streamed)
+
+    def test_dominator_set_writer_appends_bugs(self):
+        kill_map = {frozenset({5}): {1, 4}, frozenset({3}): {2},
+                    frozenset({4}): {1, 2, 3, 4}, frozenset({2}): {1, 4}}
+        result = dominator_mutants.calculate_dominating_mutants(kill_map)
+        txt_result = txt_to_dominator_mutants.generate_dominator_mutants_from_txt(
+            "test-data/groups_test0.txt")
+        expected = sorted(
+            list(dominator_set_writer.graph_dominator_set_rows(1, result)) +
+            list(dominator_set_writer.txt_dominator_set_rows(2, txt_result)),
+            key=lambda row: (row[0], sorted(row[1])))
+        self.assertIn((1, frozenset({2, 5}), 4), expected)
+        self.assertIsNone(expected[-1][2])
+
+        with tempfile.TemporaryDirectory() as directory:
+            for binary in (False, True):
+                filename = os.path.join(directory, "dominators_{}".format(
+                    binary))
+                dominator_set_writer.write_dominator_sets(
+                    filename, dominator_set_writer.graph_dominator_set_rows(
+                        1, result), binary=binary, append=True)
+                dominator_set_writer.write_dominator_sets(
+                    filename, dominator_set_writer.txt_dominator_set_rows(
+                        2, txt_result), binary=binary, append=True)
+                rows = dominator_set_writer.read_dominator_sets(filename,
+                                                                binary)
+                self.assertEqual(expected, sorted(
+                    rows, key=lambda row: (row[0], sorted(row[1]))))
+
+    def test_canonical_subtoken(self):
+        canonical = naturalness_tools.canonical_subtoken
+        self.assertEqual(canonical("0"), canonical("0L"))
+        self.assertEqual(canonical("2"), canonical("2.0F"))
+        self.assertEqual(canonical("1.5"), canonical("1.50"))
+        self.assertEqual(" ", canonical("' '"))
+        self.assertEqual("x.0F", canonical("x.0F"))
+        self.assertEqual("0xff", canonical("0xff"))
+
+    def test_combine_mapping_matches_subtoken_spellings(self):
+        canonical = naturalness_tools.canonical_subtoken
+        mutant_token_mapping = naturalness_tools.MutantTokens(
+            [1, 2, 3, 4, 5, 6], [10, 10, 11, 11, 12, 13],
+            [canonical(subtoken) for subtoken
+             in ["x", "0L", "2.0F", "' '", "1.50", "y"]])
+        token_prob_position_score = {
+            (token, canonical(subtoken)): scores for token, subtoken, scores
+            in [(10, "x", [0.1, 0.2]), (10, "0", [0.3, 0.4]),
+                (11, "2", [0.5, 0.6]), (11, " ", [0.7, 0.8]),
+                (12, "1.5", [0.9, 1.0]), (14, "y", [1.1, 1.2])]}
+        result = naturalness_tools.combine_mapping(mutant_token_mapping,
+                                                   token_prob_position_score)
+        self.assertEqual({1: [0.1, 0.2], 2: [0.3, 0.4], 3: [0.5, 0.6],
+                          4: [0.7, 0.8], 5: [0.9, 1.0]}, result)
+
+    def test_generate_mutant_to_token_mapping(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_file = os.path.join(directory, "mutants.log")
+            with open(log_file, "w") as fo:
+                fo.write("1;LIT;10;0L;a.b.C@d\n"
+                         "2;LIT;11;\";\";a.b.C@d\n"
+                         "3;LIT;11;'\\'';a.b.C@d\n"
+                         "not a mutant line\n"
+                         "4;VAR;12;this.size;a.b.C@d\n")
+            result = naturalness_tools.generate_mutant_to_token_mapping(
+                log_file)
+        self.assertEqual([1, 2, 3, 4], list(result.mutants))
+        self.assertEqual([10, 11, 11, 12], list(result.tokens))
+        self.assertEqual([naturalness_tools.canonical_subtoken("0"), ";",
+                          "\\'", "this.size"], result.subtokens)
+
+    def test_load_naturalness_scores_reuses_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_file = os.path.join(directory, "mutants.log")
+            with open(log_file, "w") as fo:
+                fo.write("1;LIT;44;',';a.b.C@d\n"
+                         "2;LIT;98;89;a.b.C@d\n"
+                         "3;LIT;7;x;a.b.C@d\n")
+            expected = naturalness_tools.combine_mapping(
+                naturalness_tools.generate_mutant_to_token_mapping(log_file),
+                naturalness_tools.generate_scores("test2.txt"))
+            self.assertEqual([1, 2], sorted(expected))
+
+            result = naturalness_tools.load_naturalness_scores(
+                log_file, "test2.txt", directory)
+            self.assertEqual(expected, result)
+            with mock.patch.object(naturalness_tools, "generate_scores",
+                                   side_effect=AssertionError):
+                self.assertEqual(expected,
+                                 naturalness_tools.load_naturalness_scores(
+                                     log_file, "test2.txt", directory))
+
+            cache_dir = os.path.join(directory, "cache")
+            naturalness_tools.load_naturalness_scores(
+                log_file, "test2.txt", cache_dir)
+            with open(log_file, "a") as fo:
+                fo.write("4;LIT;44;',';a.b.C@d\n")
+            result = naturalness_tools.load_naturalness_scores(
+                log_file, "test2.txt", cache_dir)
+            self.assertEqual(expected[1], result[4])
+            self.assertEqual(1, len(os.listdir(cache_dir)))
+
+            default_dir = os.path.join(directory, "default")
+            with mock.patch.object(naturalness_tools, "DEFAULT_CACHE_DIR",
+                                   default_dir):
+                naturalness_tools.load_naturalness_scores(log_file,
+                                                          "test2.txt")
+            self.assertEqual(1, len(os.listdir(default_dir)))
+
+    def test_generate_scores_splits_delimiters(self):
+        result = naturalness_tools.generate_scores("test2.txt")
+        self.assertEqual(22, len(result))
+        self.assertEqual([0.10392584687304879, 0.002617073081174128,
+                          0.12070104315754344, 0.14285714285714288],
+                         result[44, ","])
+        self.assertEqual([0.0834255966261258, 0.002617073081174128,
+                          0.12070104315754344, 0.047619047619047616],
+                         result[44, "\\'"])
+        self.assertEqual([0.00023781310863929192, 0.02261819497529715,
+                          0.1567014751117623, 7.047099953202866e-06],
+                         result[12, "org.apache.commons.lang3.exception."
+                                    "CloneFailedException::serialVersionUID"])
+        self.assertIsNone(naturalness_tools.parse_score_line(
+            "TOKREP_LIT(1)<\"a\"> -> \"#\"#0.5\n"))
+        self.assertEqual(((1, "#"), [0.5, 0.25, 0.1, 0.2]),
+                         naturalness_tools.parse_score_line(
+                             "TOKREP_LIT(1)<\"a\"> -> \"#\"#0.5#0.25#true#0.1"
+                             "#true#false#0.2\n"))
+
+    def test_generate_scores_keeps_last_duplicate_and_first_spelling(self):
+        line = "TOKREP_LIT({})<\"a\"> -> {}#{}#0.5#true#0.1#true#false#0.2\n"
+        with tempfile.TemporaryDirectory() as directory:
+            mml_csv = os.path.join(directory, "mml_confidence_data.csv")
+            with open(mml_csv, 'w') as fo:
+                fo.write(line.format(1, "\"x\"", 0.1))
+                fo.write(line.format(1, "\"x\"", 0.3))
+                fo.write(line.format(2, "0L", 0.4))
+                fo.write(line.format(2, "0", 0.6))
+                fo.write(line.format(2, "0L", 0.7))
+            result = naturalness_tools.generate_scores(mml_csv)
+        self.assertEqual([0.3, 0.5, 0.1, 0.2], result[1, "x"])
+        self.assertEqual([0.7, 0.5, 0.1, 0.2], result[2, "0.0"])
+
+    def test_benchmark_parsers_collect_scores_like_generate_scores(self):
+        with open("test2.txt") as fo:
+            lines = fo.readlines()
+        expected = {key: scores[:2] for key, scores in
+                    naturalness_tools.generate_scores("test2.txt").items()}
+        for parser in (naturalness_tools.parse_score_line,
+                       benchmark_naturalness.legacy_parse_score_line):
+            self.assertEqual(expected,
+                             benchmark_naturalness.parse_all(parser, lines))
+
+    def test_merge_killmaps_with_offset(self):
+        traditional = {frozenset({1}): {1, 2}, frozenset({2}): {3}}
+        natural = {frozenset({1}): {1, 2}, frozenset({5}): {4}}
+        merged = dominator_mutants.merge_killmaps(traditional, natural, 100)
+        self.assertEqual({frozenset({1}): {1, 2}, frozenset({2}): {3},
+                          frozenset({101}): {1, 2}, frozenset({105}): {4}},
+                         merged)
+        self.assertEqual({frozenset({1}): {1, 2}, frozenset({2}): {3}},
+                         traditional)
+        self.assertRaises(ValueError, dominator_mutants.merge_killmaps,
+                          traditional, natural, 1)
+
+        unique = dominator_mutants.convert_killmap_to_unique_killmap(merged)
+        self.assertEqual({frozenset({1, 101}): {1, 2}, frozenset({2}): {3},
+                          frozenset({105}): {4}}, unique)
+        self.assertEqual(
+            {1: {frozenset({1, 101})}, 2: {frozenset({1, 101})},
+             3: {frozenset({2})}, 4: {frozenset({105})}},
+            dominator_mutants.convert_unique_killmap_to_reverse_killmap(
+                unique))
+
+    def test_unique_killmap_mutant_to_group_index(self):
+        unique, index = \
+            dominator_mutants.convert_csv_to_unique_killmap_and_index(
+                "test-data/test.csv")
+        self.assertEqual(sum(len(group) for group in unique), len(index))
+        for group in unique:
+            for mutant in group:
+                self.assertIs(group, index[mutant])
+
+    def test_rank_by_naturalness(self):
+        mutant_to_scores = {frozenset({1}): [0.5, 0.25, 0.3, 0.1],
+                            frozenset({2}): [0.25, 0.5, 0.2, 0.1],
+                            frozenset({3}): [0.1, 0.1, 0.1, 0.1],
+                            frozenset({4}): [0.2, 0.2, 0.4, 0.1]}
+        expected = sorted(mutant_to_scores,
+                          key=lambda i: -np.log(mutant_to_scores[i][0] /
+                                                mutant_to_scores[i][1]))
+        result = naturalness_tools.rank_by_naturalness(
+            mutant_to_scores,
+            {"log_ratio": naturalness_tools.log_ratio_ranking,
+             "third_column": lambda scores: -scores[:, 2]})
+        self.assertEqual(expected, result["log_ratio"])
+        self.assertEqual([frozenset({4}), frozenset({1}), frozenset({2}),
+                          frozenset({3})], result["third_column"])
+
+    def test_rank_by_naturalness_without_mutants(self):
+        self.assertEqual({"log_ratio": []},
+                         naturalness_tools.rank_by_naturalness(dict()))
+
     def test_completeness_plot_single_mutant(self):
         kill_map = {frozenset({1}): {1, 2}}
         result = test_completeness.generate_test_completeness_plot(kill_map)
@@ -1283,6 +1510,28 @@ class TestCase(unittest.TestCase):
         result = test_completeness.generate_test_completeness_plot(kill_map)
         self.assertEqual([(0, 0), (1, 5), (2, 9), (3, 9)], result)
 
+    def test_best_case_plot_keeps_dominator_order_of_equal_sizes(self):
+        # 1 subsumes 2, 8 and 11; 5 and 6 both subsume 3 mutants and share
+        # 7, while only 5 shares 2 with 1
+        first = {frozenset({1}): {1}, frozenset({2}): {1, 2},
+                 frozenset({8}): {1, 4}, frozenset({11}): {1, 5}}
+        five = {frozenset({5}): {2}, frozenset({7}): {2, 3}}
+        six = {frozenset({6}): {3}, frozenset({10}): {3, 4}}
+
+        kill_map = {**first, **five, **six}
+        self.assertEqual([{1}, {5}, {6}], [
+            set(node.mutant_identifier) for node in
+            dominator_mutants.calculate_dominating_mutants(kill_map)[2]])
+        self.assertEqual([0, 50.0, 75.0, 100.0],
+                         plot_tools.generate_test_completeness_plot(kill_map))
+
+        kill_map = {**first, **six, **five}
+        self.assertEqual([{1}, {6}, {5}], [
+            set(node.mutant_identifier) for node in
+            dominator_mutants.calculate_dominating_mutants(kill_map)[2]])
+        self.assertEqual([0, 50.0, 87.5, 100.0],
+                         plot_tools.generate_test_completeness_plot(kill_map))
+
     # def test_completeness_plot_two_separate_branches_with_plotting(self):
     #     kill_map = {frozenset({1}): {1, 2}, frozenset({2}): {1, 4},
     #                 frozenset({4}): {1, 2, 3, 4},
@@ -1300,3 +1549,463 @@ class TestCase(unittest.TestCase):
     #          (14, 28), (15, 28), (16, 28), (17, 28), (18, 28), (19, 28),
     #          (20, 28), (21, 28)]
     #         , result)
+
+    def test_simulate_work_follows_ordering(self):
+        killmap = {frozenset({1, 2}): {1}, frozenset({3}): {1, 2},
+                   frozenset({4}): {3}, frozenset({5}): {4}}
+        rev_killmap = dominator_mutants. \
+            convert_unique_killmap_to_reverse_killmap(killmap)
+        ordering = [frozenset({4}), frozenset({1, 2}), frozenset({3}),
+                    frozenset({5})]
+        result = work_simulation.simulate_work(ordering, killmap, rev_killmap,
+                                               5)
+        self.assertEqual(([0, 20.0, 80.0, 100.0], 5), result)
+        self.assertEqual([frozenset({4}), frozenset({1, 2}), frozenset({3}),
+                          frozenset({5})], ordering)
+        self.assertEqual({1: {frozenset({1, 2}), frozenset({3})},
+                          2: {frozenset({3})}, 3: {frozenset({4})},
+                          4: {frozenset({5})}}, rev_killmap)
+
+    def test_simulate_work_stops_when_ordering_is_exhausted(self):
+        killmap = {frozenset({1}): {1}, frozenset({2}): {2}}
+        rev_killmap = dominator_mutants. \
+            convert_unique_killmap_to_reverse_killmap(killmap)
+        result = work_simulation.simulate_work([frozenset({2})], killmap,
+                                               rev_killmap, 2)
+        self.assertEqual(([0, 50.0], 1), result)
+
+    def test_simulate_random_trials_matches_simulate_work(self):
+        killmap = {frozenset({1, 2}): {1, 5}, frozenset({3}): {1, 2},
+                   frozenset({4}): {3, 5}, frozenset({5}): {4},
+                   frozenset({6}): {2, 4, 5}}
+        rev_killmap = dominator_mutants. \
+            convert_unique_killmap_to_reverse_killmap(killmap)
+        matrix = work_simulation.KillMatrix(killmap)
+        rng = np.random.default_rng(7)
+        orders = np.argsort(rng.random((50, len(killmap))), axis=1)
+        uniforms = rng.random((50, len(killmap)))
+        curves, lengths = work_simulation.simulate_random_trials(
+            matrix, orders, uniforms)
+
+        for trial in range(50):
+            draws = iter(uniforms[trial])
+            chooser = mock.Mock()
+            chooser.choice.side_effect = \
+                lambda tests: tests[int(next(draws) * len(tests))]
+            ordering = [matrix.groups[group] for group in orders[trial]]
+            plot, _ = work_simulation.simulate_work(
+                ordering, killmap, rev_killmap, 6, chooser)
+            self.assertEqual(len(plot), lengths[trial])
+            np.testing.assert_allclose(plot, curves[trial, :len(plot)])
+            self.assertTrue(np.isnan(curves[trial, len(plot):]).all())
+
+    def test_random_trials_do_not_depend_on_chunks_or_workers(self):
+        killmap = {frozenset({1, 2}): {1, 5}, frozenset({3}): {1, 2},
+                   frozenset({4}): {3, 5}, frozenset({5}): {4},
+                   frozenset({6}): {2, 4, 5}}
+        matrix = work_simulation.KillMatrix(killmap)
+        curves, lengths = trial_runner.random_trials(matrix, 20, seed=3)
+        self.assertEqual((20,), lengths.shape)
+        self.assertTrue((curves[:, 0] == 0).all())
+
+        for chunk_size, workers in ((1, None), (7, None), (6, 2)):
+            other_curves, other_lengths = trial_runner.random_trials(
+                matrix, 20, seed=3, workers=workers, chunk_size=chunk_size)
+            np.testing.assert_array_equal(lengths, other_lengths)
+            np.testing.assert_array_equal(curves, other_curves)
+
+    def test_curve_aggregator_matches_full_statistics(self):
+        rng = np.random.default_rng(5)
+        lengths = rng.integers(1, 30, 40)
+        curves = np.full((40, lengths.max()), np.nan)
+        for trial, length in enumerate(lengths):
+            curves[trial, :length] = np.sort(rng.random(length)) * 100
+        curves[:, 0] = 0
+
+        aggregator = trial_runner.CurveAggregator(bins=100000)
+        aggregator.add(curves[:15])
+        aggregator.add(curves[15, :lengths[15]])
+        aggregator.add(curves[16:])
+
+        np.testing.assert_array_equal(np.sum(~np.isnan(curves), axis=0),
+                                      aggregator.count)
+        np.testing.assert_allclose(np.nanmean(curves, axis=0),
+                                   aggregator.mean)
+        reached = aggregator.count > 1
+        np.testing.assert_allclose(
+            np.nanvar(curves, axis=0, ddof=1)[reached],
+            aggregator.variance()[reached])
+        np.testing.assert_allclose(
+            np.nanpercentile(curves, 50, axis=0, method='inverted_cdf'),
+            aggregator.percentile(50), atol=100 / 100000)
+        lower, upper = aggregator.confidence_interval()
+        self.assertTrue((lower[reached] <= aggregator.mean[reached]).all())
+        self.assertTrue((upper[reached] >= aggregator.mean[reached]).all())
+        np.testing.assert_array_equal(0, aggregator.percentile(95)[0])
+
+    def test_aggregate_trials_averages_random_trials(self):
+        killmap = {frozenset({1, 2}): {1, 5}, frozenset({3}): {1, 2},
+                   frozenset({4}): {3, 5}, frozenset({5}): {4},
+                   frozenset({6}): {2, 4, 5}}
+        matrix = work_simulation.KillMatrix(killmap)
+        curves, _ = trial_runner.random_trials(matrix, 30, seed=11)
+        aggregator = trial_runner.aggregate_trials(matrix, 30, seed=11,
+                                                   chunk_size=4)
+        np.testing.assert_allclose(np.nanmean(curves, axis=0),
+                                   aggregator.mean)
+        self.assertIsNone(aggregator.histogram)
+        self.assertRaises(ValueError, aggregator.percentile, 50)
+
+    def test_curve_aggregator_grows_with_longer_curves(self):
+        aggregator = trial_runner.CurveAggregator()
+        padded = np.full((5, 5), np.nan)
+        for length in range(1, 6):
+            padded[length - 1, :length] = np.linspace(0, 100, length)
+            aggregator.add(padded[length - 1, :length])
+        np.testing.assert_array_equal([5, 4, 3, 2, 1], aggregator.count)
+        np.testing.assert_allclose(np.nanmean(padded, axis=0),
+                                   aggregator.mean)
+        np.testing.assert_array_equal(np.nanmax(padded, axis=0),
+                                      aggregator.maximum)
+
+    def test_simulate_ordering_matches_simulate_work(self):
+        killmap = {frozenset({1, 2}): {1, 5}, frozenset({3}): {1, 2},
+                   frozenset({4}): {3, 5}, frozenset({5}): {4},
+                   frozenset({6}): {2, 4, 5}}
+        rev_killmap = dominator_mutants. \
+            convert_unique_killmap_to_reverse_killmap(killmap)
+        matrix = work_simulation.KillMatrix(killmap)
+        self.assertEqual(matrix.group_index[frozenset({1, 2})],
+                         matrix.mutant_index[2])
+        with self.assertRaises(ValueError):
+            matrix.test_groups[0] = 1
+
+        for seed in range(20):
+            order = np.random.default_rng(seed).permutation(len(killmap))
+            ordering = [matrix.groups[group] for group in order]
+            expected = work_simulation.simulate_work(
+                ordering, killmap, rev_killmap, 6, random.Random(seed))
+            result = work_simulation.simulate_ordering(
+                matrix, order, random.Random(seed))
+            self.assertEqual(expected, result)
+        self.assertEqual(([0, 50.0], 3),
+                         work_simulation.simulate_ordering(
+                             matrix, [1, 0], mock.Mock(choice=min)))
+
+    def test_evaluate_strategies_shares_bug_context(self):
+        killmap = {frozenset({1}): {1, 5}, frozenset({2}): {1, 5},
+                   frozenset({3}): {1, 2}, frozenset({4}): {3, 5},
+                   frozenset({5}): {4}, frozenset({6}): {2, 4, 5}}
+        context = strategies.BugContext("unused", {
+            mutant_type: killmap for mutant_type in strategies.MUTANT_TYPES})
+
+        with mock.patch.dict(strategies.STRATEGIES, clear=True):
+            strategies.ordering_strategy("reverse", "natural-mutants")(
+                lambda context, matrix: list(
+                    reversed(range(len(matrix.groups)))))
+            strategies.register_strategy("random", "natural-mutants",
+                                         "random")
+            strategies.register_strategy("constant", "all-mutants", "curve",
+                                         lambda context, plot=None:
+                                         [0, 100])
+            with self.assertRaises(ValueError):
+                strategies.register_strategy("bad", "natural-mutants",
+                                             "curve")
+            curves = strategies.evaluate_strategies(context, None, 20, seed=4)
+
+        self.assertEqual(["reverse", "random", "constant"], list(curves))
+        self.assertEqual([0, 100], curves["constant"])
+        self.assertEqual(0, curves["random"][0])
+        self.assertEqual(100, curves["reverse"][-1])
+        self.assertIs(context.matrix("natural-mutants"),
+                      context.matrix("natural-mutants"))
+        self.assertEqual({1, 2}, set(context.matrix("all-mutants").groups[0]))
+
+    def test_curve_metrics_summarize_curves_incrementally(self):
+        metrics = work_simulation.CurveMetrics()
+        for point in [50.0, 80.0, 90.0, 100.0]:
+            metrics.append(point)
+        self.assertEqual({"work": 4, "final": 100.0, "auc": 270.0,
+                          "work_to_50": 1, "work_to_80": 2,
+                          "work_to_100": 4}, metrics.summary())
+
+        killmap = {frozenset({1, 2}): {1, 5}, frozenset({3}): {1, 2},
+                   frozenset({4}): {3, 5}, frozenset({5}): {4},
+                   frozenset({6}): {2, 4, 5}}
+        matrix = work_simulation.KillMatrix(killmap)
+        curves, lengths = trial_runner.random_trials(matrix, 30, seed=2)
+        summary = work_simulation.summarize_curves(curves, lengths)
+        for trial in range(30):
+            metrics = work_simulation.CurveMetrics()
+            for point in curves[trial, 1:lengths[trial]]:
+                metrics.append(point)
+            for metric, value in metrics.summary().items():
+                self.assertAlmostEqual(value, summary[metric][trial])
+
+        means = trial_runner.summarize_trials(matrix, 30, seed=2,
+                                              chunk_size=7)
+        for metric, values in summary.items():
+            self.assertAlmostEqual(np.mean(values), means[metric])
+
+    def test_tests_covered_all_matches_get_tests_covered(self):
+        kill_map = dominator_mutants.convert_csv_to_killmap(
+            "test-data/killMap_lang_16.csv")
+        graph = dominator_mutants.calculate_dominating_mutants(kill_map)[0]
+        tests, tests_covered = graph.tests_covered_all()
+        self.assertEqual(len(graph.nodes), len(tests_covered))
+        for node in graph.nodes:
+            covered = {test for bit, test in enumerate(tests)
+                       if tests_covered[node] >> bit & 1}
+            self.assertEqual(graph.get_tests_covered(node), covered)
+            self.assertEqual(len(covered),
+                             dominator_mutants.count_tests(
+                                 tests_covered[node]))
+
+    def test_run_batch_isolates_failing_bugs(self):
+        runs = list(batch_runner.run_batch(divmod_pipeline, [4, 0, 2]))
+        self.assertEqual([4, 0, 2], [run.bug for run in runs])
+        self.assertEqual((2, 0), runs[0].result)
+        self.assertIsNone(runs[1].result)
+        self.assertIn("ZeroDivisionError", runs[1].error)
+        self.assertIn("divide", runs[2].timings)
+        self.assertEqual(["Bug", "Stage", "Seconds"],
+                         batch_runner.TIMING_COLUMNS)
+        self.assertEqual([2, "divide"],
+                         batch_runner.timing_rows(runs[2])[0][:2])
+
+        parallel_runs = list(batch_runner.run_batch(divmod_pipeline,
+                                                    [4, 0, 2], workers=2))
+        self.assertEqual({run.bug: run.result for run in runs},
+                         {run.bug: run.result for run in parallel_runs})
+        self.assertEqual([1, 2, 3, 7, 10, 11],
+                         batch_runner.parse_bugs("1-3,7,10-11"))
+
+    def test_run_batch_isolates_dying_worker_processes(self):
+        runs = {run.bug: run for run in batch_runner.run_batch(
+            exiting_pipeline, [4, 3, 2, 1, 8], workers=2)}
+        self.assertEqual([1, 2, 3, 4, 8], sorted(runs))
+        self.assertIn("BrokenProcessPool", runs[3].error)
+        self.assertIsNone(runs[3].result)
+        self.assertIn("total", runs[3].timings)
+        self.assertEqual({4: (2, 0), 2: (4, 0), 1: (8, 0), 8: (1, 0)},
+                         {bug: run.result for bug, run in runs.items()
+                          if bug != 3})
+
+    def test_run_batch_isolates_unpicklable_results(self):
+        runs = {run.bug: run for run in batch_runner.run_batch(
+            unpicklable_pipeline, [4, 3, 2], workers=2)}
+        self.assertEqual([2, 3, 4], sorted(runs))
+        self.assertIsNone(runs[3].result)
+        self.assertIn("pickle", runs[3].error.lower())
+        self.assertIn("total", runs[3].timings)
+        self.assertEqual({4: (2, 0), 2: (4, 0)},
+                         {bug: run.result for bug, run in runs.items()
+                          if bug != 3})
+
+    def test_artifact_cache_memoizes_by_key(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = artifact_cache.ArtifactCache(cache_dir)
+            compute = mock.Mock(return_value={"curve": [0, 50.0, 100.0]})
+            first = cache.get_or_compute("stage", ("digest", 1), compute)
+            second = cache.get_or_compute("stage", ("digest", 1), compute)
+            self.assertEqual(first, second)
+            self.assertEqual(1, compute.call_count)
+            cache.get_or_compute("stage", ("digest", 2), compute)
+            self.assertEqual(2, compute.call_count)
+            self.assertEqual("missing", artifact_cache.file_digest(
+                os.path.join(cache_dir, "absent.csv")))
+
+    def test_evaluate_strategies_resumes_from_cache(self):
+        killmap = {frozenset({1}): {1, 5}, frozenset({2}): {1, 2},
+                   frozenset({3}): {3, 5}, frozenset({4}): {4}}
+        killmaps = {mutant_type: killmap
+                    for mutant_type in strategies.MUTANT_TYPES}
+        order = mock.Mock(side_effect=lambda context, matrix: [2, 0, 1, 3])
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                mock.patch.dict(strategies.STRATEGIES, clear=True):
+            strategies.ordering_strategy("fixed", "traditional-mutants")(
+                order)
+            strategies.register_strategy("random", "natural-mutants",
+                                         "random")
+            cache = artifact_cache.ArtifactCache(cache_dir)
+            first = strategies.evaluate_strategies(
+                strategies.BugContext(cache_dir, killmaps, cache), None, 5,
+                seed=3)
+            second = strategies.evaluate_strategies(
+                strategies.BugContext(cache_dir, killmaps, cache), None, 5,
+                seed=3)
+            self.assertEqual(1, order.call_count)
+            self.assertEqual(first["fixed"], second["fixed"])
+            np.testing.assert_array_equal(first["random"], second["random"])
+
+            strategies.ordering_strategy("fixed", "traditional-mutants",
+                                         version=2)(order)
+            strategies.evaluate_strategies(
+                strategies.BugContext(cache_dir, killmaps, cache), None, 5,
+                seed=3)
+            self.assertEqual(2, order.call_count)
+
+    def test_builtin_strategies_are_registered(self):
+        for prefix in ("traditional", "natural", "all"):
+            self.assertEqual("curve",
+                             strategies.STRATEGIES[prefix + "_bestcase"].kind)
+            self.assertEqual("random",
+                             strategies.STRATEGIES[prefix + "_random"].kind)
+        self.assertIs(strategies.naturalness_order, strategies.STRATEGIES[
+            "natural_naturalness"].function)
+        self.assertIs(strategies.traditional_naturalness_order,
+                      strategies.STRATEGIES[
+                          "traditional_naturalness"].function)
+        context = strategies.BugContext(
+            "", {"traditional-mutants": {frozenset({1}): {1},
+                                         frozenset({2}): {1, 2}}})
+        self.assertEqual([0, 100.0], strategies.STRATEGIES[
+            "traditional_bestcase"].function(context))
+
+    def test_strategies_are_keyed_by_their_own_inputs_and_name(self):
+        killmap = {frozenset({1}): {1, 5}, frozenset({2}): {1, 2},
+                   frozenset({3}): {3, 5}, frozenset({4}): {4}}
+        killmaps = {mutant_type: killmap
+                    for mutant_type in strategies.MUTANT_TYPES}
+        with tempfile.TemporaryDirectory() as directory:
+            results_dir = directory + os.sep
+            context = strategies.BugContext(results_dir, killmaps)
+            log_file = context.input_files()["mutants_log"]
+            os.makedirs(os.path.dirname(log_file))
+            with open(log_file, "w") as fo:
+                fo.write("1;LIT;44;',';a.b.C@d\n")
+            natural = strategies.STRATEGIES["natural_naturalness"]
+            traditional = strategies.STRATEGIES["traditional_random"]
+            before = [context.strategy_digests(natural),
+                      context.strategy_digests(traditional)]
+            with open(log_file, "a") as fo:
+                fo.write("2;LIT;98;89;a.b.C@d\n")
+            context = strategies.BugContext(results_dir, killmaps)
+            self.assertNotEqual(before[0], context.strategy_digests(natural))
+            self.assertEqual(before[1],
+                             context.strategy_digests(traditional))
+
+            names = ["traditional_random", "natural_random"]
+            first = strategies.evaluate_strategies(context, names, 5, seed=3)
+            second = strategies.evaluate_strategies(
+                context, ["all_random"] + names[::-1], 5, seed=3)
+            for name in names:
+                np.testing.assert_array_equal(first[name], second[name])
+
+    def test_traditional_naturalness_order_matches_baseline(self):
+        killmap = {frozenset({1, 2}): {1}, frozenset({3}): {2},
+                   frozenset({4}): {1, 3}, frozenset({5, 6}): {3},
+                   frozenset({7}): {4}}
+        # 6 and 3 tie, 2 and 1 (and 6 and 5) share a group, 9 is not in
+        # the kill map, and 4 and 7 have no score
+        rows = ["Mutant", "6,0.5,0.5", "3,0.5,0.5", "2,0.9,0.9",
+                "9,0.1,0.1", "1,1.0,1.0", "5,0.2,0.2"]
+        with tempfile.TemporaryDirectory() as directory:
+            context = strategies.BugContext(
+                directory + os.sep, {"traditional-mutants": killmap})
+            csv_filename = context.input_files()["traditional_naturalness"]
+            os.makedirs(os.path.dirname(csv_filename))
+            with open(csv_filename, "w") as fo:
+                fo.write("\n".join(rows) + "\n")
+            matrix = context.matrix("traditional-mutants")
+            order = strategies.traditional_naturalness_order(context, matrix)
+
+        # the scan of every group of plot_traditional_naturalness before
+        # the mutant to group index
+        expected = []
+        for row in rows[1:]:
+            for group in killmap:
+                if int(row.split(",")[0]) in group and \
+                        group not in expected:
+                    expected.append(group)
+        self.assertEqual([frozenset({5, 6}), frozenset({3}),
+                          frozenset({1, 2})], expected)
+        self.assertEqual(expected, [matrix.groups[group] for group in order])
+
+    def test_evaluate_strategies_keys_cache_by_given_killmaps(self):
+        first = {frozenset({1}): {1}, frozenset({2}): {2}}
+        second = {frozenset({1}): {1}, frozenset({2}): {2},
+                  frozenset({3}): {3}, frozenset({4}): {4}}
+        order = mock.Mock(side_effect=lambda context, matrix: list(
+            range(len(matrix.group_sizes))))
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                mock.patch.dict(strategies.STRATEGIES, clear=True):
+            strategies.ordering_strategy("fixed", "traditional-mutants")(
+                order)
+            cache = artifact_cache.ArtifactCache(cache_dir)
+            results = [strategies.evaluate_strategies(strategies.BugContext(
+                cache_dir, {mutant_type: killmap for mutant_type in
+                            strategies.MUTANT_TYPES}, cache), seed=3)
+                for killmap in (first, second)]
+            self.assertEqual([0, 50.0, 100.0], results[0]["fixed"])
+            self.assertEqual([0, 25.0, 50.0, 75.0, 100.0],
+                             results[1]["fixed"])
+            self.assertEqual(strategies.killmaps_digest({"t": first}),
+                             strategies.killmaps_digest({"t": dict(
+                                 reversed(list(first.items())))}))
+
+    def test_result_store_appends_and_loads_selected_curves(self):
+        with tempfile.TemporaryDirectory() as store_dir:
+            store = result_store.ResultStore(store_dir)
+            store.append(7, {"random": np.array([0, 25.0, 100.0]),
+                             "bestcase": [0, 50.0, 100.0]})
+            store.append(2, {"random": [0, 100.0]})
+            store.append(7, {"bestcase": [0, 100.0]})
+
+            reopened = result_store.ResultStore(store_dir)
+            self.assertEqual([2, 7], reopened.bugs())
+            loaded = reopened.load([7], ["bestcase", "random"])
+            self.assertEqual([7], list(loaded))
+            self.assertEqual(["bestcase", "random"], list(loaded[7]))
+            np.testing.assert_array_equal([0, 100.0], loaded[7]["bestcase"])
+            np.testing.assert_array_equal([0, 25.0, 100.0],
+                                          loaded[7]["random"])
+            self.assertEqual({2: ["random"], 7: ["random", "bestcase"]},
+                             {bug: list(curves) for bug, curves in
+                              reopened.iter_results()})
+
+    def test_render_bugs_draws_each_bug_on_its_own_figure(self):
+        with tempfile.TemporaryDirectory() as store_dir:
+            store = result_store.ResultStore(store_dir)
+            for bug in (1, 2):
+                store.append(bug, {name: [0, 50.0, 100.0] for name in
+                                   plot_tools.TRADITIONAL_STRATEGIES})
+            prefix = os.path.join(store_dir, "lang_")
+            with mock.patch("builtins.print"):
+                filenames = plot_tools.render_bugs(
+                    store, [1, 3, 2], plot_tools.TRADITIONAL_STRATEGIES,
+                    plot_tools.TRADITIONAL_PLOT_NAMES, prefix, dpi=20)
+            self.assertEqual([prefix + "1.png", prefix + "2.png"], filenames)
+            for filename in filenames:
+                self.assertTrue(os.path.getsize(filename) > 0)
+
+            store.append(3, {name: [0, 100.0] for name in
+                             plot_tools.TRADITIONAL_STRATEGIES})
+            with mock.patch("builtins.print"):
+                filenames = plot_tools.render_bugs(
+                    store, [3], plot_tools.TRADITIONAL_STRATEGIES,
+                    plot_tools.TRADITIONAL_PLOT_NAMES, prefix, dpi=20)
+                parallel_filenames = plot_tools.render_bugs(
+                    store, [1, 3], plot_tools.TRADITIONAL_STRATEGIES,
+                    plot_tools.TRADITIONAL_PLOT_NAMES, prefix, dpi=20,
+                    workers=2)
+            self.assertEqual([prefix + "3.png"], filenames)
+            self.assertEqual([prefix + "1.png", prefix + "3.png"],
+                             sorted(parallel_filenames))
+
+
+def divmod_pipeline(bug, timings):
+    timings["divide"] = 0.0
+    return divmod(8, bug)
+
+
+def exiting_pipeline(bug, timings):
+    if bug == 3:
+        os._exit(1)
+    return divmod_pipeline(bug, timings)
+
+
+def unpicklable_pipeline(bug, timings):
+    if bug == 3:
+        return lambda: bug
+    return divmod_pipeline(bug, timings)
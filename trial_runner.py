@@ -0,0 +1,367 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+from work_simulation import KillMatrix, simulate_random_trials, \
+    summarize_curves
+
+# the kill matrix of the worker process and the shared memory blocks that
+# hold its arrays, see _attach_kill_matrix
+_worker_matrix = None
+_worker_blocks = list()
+
+
+def trial_inputs(seed_sequence, number_of_groups):
+    """ Draws the random ordering and the numbers used to pick tests of one
+    trial from the trial's own stream
+
+    :param seed_sequence: np.random.SeedSequence
+                The seed of the trial
+    :param number_of_groups: int
+                The number of groups of mutants
+    :return: tuple (np.ndarray, np.ndarray)
+                The ordering of the group indices and the floats in [0, 1)
+                used to pick tests
+    """
+    rng = np.random.default_rng(seed_sequence)
+    return rng.permutation(number_of_groups), rng.random(number_of_groups)
+
+
+def simulate_trials(matrix, seed_sequences):
+    """ Simulates one batch of trials, see documentation for
+    simulate_random_trials
+
+    :param matrix: KillMatrix
+                The kill matrix of the mutants
+    :param seed_sequences: list[np.random.SeedSequence]
+                The seeds of the trials
+    :return: tuple (np.ndarray, np.ndarray)
+                The curves of the trials, padded with NaN, and their lengths
+    """
+    number_of_groups = len(matrix.group_sizes)
+    orders = np.empty((len(seed_sequences), number_of_groups), dtype=np.int64)
+    uniforms = np.empty((len(seed_sequences), number_of_groups))
+    for trial, seed_sequence in enumerate(seed_sequences):
+        orders[trial], uniforms[trial] = trial_inputs(seed_sequence,
+                                                      number_of_groups)
+    return simulate_random_trials(matrix, orders, uniforms)
+
+
+def share_kill_matrix(matrix):
+    """ Copies the arrays of a kill matrix into shared memory
+
+    :param matrix: KillMatrix
+                The kill matrix of the mutants
+    :return: tuple (list[SharedMemory], list[tuple])
+                The shared memory blocks, which the caller closes and unlinks,
+                and a description (name, block name, shape, dtype) of each
+                array for _attach_kill_matrix
+    """
+    blocks = list()
+    descriptions = list()
+    for name in KillMatrix.ARRAY_NAMES:
+        array = getattr(matrix, name)
+        block = shared_memory.SharedMemory(create=True,
+                                           size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+        blocks.append(block)
+        descriptions.append((name, block.name, array.shape, array.dtype.str))
+    return blocks, descriptions
+
+
+def _attach_kill_matrix(descriptions):
+    """ Worker initializer: maps the shared kill matrix into the worker """
+    global _worker_matrix
+    arrays = dict()
+    for name, block_name, shape, dtype in descriptions:
+        block = shared_memory.SharedMemory(name=block_name)
+        _worker_blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    _worker_matrix = KillMatrix.from_arrays(arrays)
+
+
+def _simulate_shared_trials(seed_sequences):
+    return simulate_trials(_worker_matrix, seed_sequences)
+
+
+def iter_trial_chunks(matrix, number_of_trials, seed=None, workers=None,
+                      chunk_size=100):
+    """ Simulates the work evaluation of random orderings of the mutants,
+    chunk by chunk
+
+    Every trial draws its ordering and its test choices from its own NumPy
+    Generator, seeded with one of the SeedSequence(seed).spawn children, so
+    the result only depends on the seed and the number of trials, never on
+    how the trials are split between workers. Chunks of chunk_size trials are
+    simulated together by simulate_random_trials, either in this process or
+    in a pool of worker processes that read the kill matrix from shared
+    memory. The chunks are yielded in trial order as soon as they are done.
+
+    :param matrix: KillMatrix
+                The kill matrix of the mutants
+    :param number_of_trials: int
+                the number of random trials
+    :param seed: int or np.random.SeedSequence
+                The seed of the trials (default fresh entropy)
+    :param workers: int
+                The number of worker processes (default None, run in this
+                process)
+    :param chunk_size: int
+                The number of trials simulated together
+    :return: Iterator[tuple (np.ndarray, np.ndarray)]
+                    The curves of the trials of each chunk, padded with NaN,
+                    and their lengths. See documentation for
+                    simulate_random_trials
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    seed_sequences = seed.spawn(number_of_trials)
+    chunks = [seed_sequences[start:start + chunk_size]
+              for start in range(0, number_of_trials, chunk_size)]
+
+    if workers is None:
+        for chunk in chunks:
+            yield simulate_trials(matrix, chunk)
+        return
+
+    blocks, descriptions = share_kill_matrix(matrix)
+    try:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_attach_kill_matrix,
+                                 initargs=(descriptions,)) as executor:
+            yield from executor.map(_simulate_shared_trials, chunks)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def random_trials(matrix, number_of_trials, seed=None, workers=None,
+                  chunk_size=100):
+    """ Simulates the work evaluation of random orderings of the mutants and
+    keeps every curve. See documentation for iter_trial_chunks
+
+    :return: tuple (np.ndarray, np.ndarray)
+                    The curves of the trials, padded with NaN, and their
+                    lengths
+    """
+    results = list(iter_trial_chunks(matrix, number_of_trials, seed, workers,
+                                     chunk_size))
+    lengths = np.concatenate([chunk_lengths for _, chunk_lengths in results]) \
+        if results else np.zeros(0, dtype=np.int64)
+    curves = np.full((number_of_trials, int(lengths.max(initial=1))), np.nan)
+    start = 0
+    for chunk_curves, _ in results:
+        curves[start:start + len(chunk_curves), :chunk_curves.shape[1]] = \
+            chunk_curves
+        start += len(chunk_curves)
+    return curves, lengths
+
+
+class CurveAggregator:
+    """ Folds in curves of different lengths, one batch at a time
+
+    Position x of the aggregate only covers the curves that reach x. The mean
+    and variance of each position are updated with Welford's method (Chan et
+    al. when a batch is folded in), so the memory used is proportional to the
+    length of the longest curve, not to the number of curves. The arrays
+    grow geometrically as longer curves come in.
+
+    Percentiles are optional: with bins, they are read from a histogram of
+    each position with bins equal-width bins over 0 to 100, which costs bins
+    counters per position.
+    """
+
+    def __init__(self, bins=None):
+        """
+        :param bins: int
+                    The number of histogram bins per position; percentiles
+                    are exact to 100 / bins (default None, no percentiles)
+        """
+        self.bins = bins
+        self.length = 0
+        self._count = np.zeros(0, dtype=np.int64)
+        self._mean = np.zeros(0)
+        self._m2 = np.zeros(0)
+        self._minimum = np.zeros(0)
+        self._maximum = np.zeros(0)
+        self._histogram = None if bins is None else \
+            np.zeros((0, bins), dtype=np.int64)
+
+    @property
+    def count(self):
+        """ The number of curves that reach each position """
+        return self._count[:self.length]
+
+    @property
+    def mean(self):
+        """ The mean of each position """
+        return self._mean[:self.length]
+
+    @property
+    def m2(self):
+        """ The sum of squared deviations from the mean of each position """
+        return self._m2[:self.length]
+
+    @property
+    def minimum(self):
+        return self._minimum[:self.length]
+
+    @property
+    def maximum(self):
+        return self._maximum[:self.length]
+
+    @property
+    def histogram(self):
+        """ The (positions x bins) histogram, None without bins """
+        if self._histogram is None:
+            return None
+        return self._histogram[:self.length]
+
+    @staticmethod
+    def _extend(array, capacity, fill):
+        extended = np.full((capacity,) + array.shape[1:], fill,
+                           dtype=array.dtype)
+        extended[:len(array)] = array
+        return extended
+
+    def _grow(self, length):
+        if length > len(self._count):
+            capacity = max(length, 2 * len(self._count))
+            self._count = self._extend(self._count, capacity, 0)
+            self._mean = self._extend(self._mean, capacity, 0.0)
+            self._m2 = self._extend(self._m2, capacity, 0.0)
+            self._minimum = self._extend(self._minimum, capacity, np.inf)
+            self._maximum = self._extend(self._maximum, capacity, -np.inf)
+            if self._histogram is not None:
+                self._histogram = self._extend(self._histogram, capacity, 0)
+        self.length = max(self.length, length)
+
+    def add(self, curves):
+        """ Folds in a batch of curves
+
+        :param curves: np.ndarray or list[float]
+                    One curve, or a (curves x positions) array padded with
+                    NaN after the end of each curve
+        """
+        curves = np.atleast_2d(np.asarray(curves, dtype=float))
+        length = curves.shape[1]
+        self._grow(length)
+
+        present = ~np.isnan(curves)
+        batch_count = present.sum(axis=0)
+        reached = batch_count > 0
+        filled = np.where(present, curves, 0.0)
+        batch_mean = np.divide(filled.sum(axis=0), batch_count,
+                               out=np.zeros(length), where=reached)
+        batch_m2 = (np.where(present, curves - batch_mean, 0.0) ** 2).sum(
+            axis=0)
+
+        count = self.count[:length]
+        total = count + batch_count
+        delta = batch_mean - self.mean[:length]
+        weight = np.divide(batch_count, total, out=np.zeros(length),
+                           where=reached)
+        self.m2[:length] += batch_m2 + delta ** 2 * count * weight
+        self.mean[:length] += delta * weight
+        self.count[:length] = total
+
+        self.minimum[:length] = np.minimum(
+            self.minimum[:length],
+            np.where(present, curves, np.inf).min(axis=0))
+        self.maximum[:length] = np.maximum(
+            self.maximum[:length],
+            np.where(present, curves, -np.inf).max(axis=0))
+
+        if self._histogram is None:
+            return
+        positions, _ = np.nonzero(present.T)
+        values = curves.T[present.T]
+        bins = np.clip((values * self.bins / 100).astype(np.int64), 0,
+                       self.bins - 1)
+        np.add.at(self.histogram, (positions, bins), 1)
+
+    def variance(self):
+        """
+        :return: np.ndarray
+                    The sample variance of each position (NaN where fewer
+                    than two curves reach it)
+        """
+        return np.divide(self.m2, self.count - 1,
+                         out=np.full(len(self.count), np.nan),
+                         where=self.count > 1)
+
+    def confidence_interval(self, z=1.96):
+        """ The normal approximation confidence interval of the mean
+
+        :param z: float
+                    The standard normal quantile of the confidence level
+                    (1.96 for 95%)
+        :return: tuple (np.ndarray, np.ndarray)
+                    The lower and upper bound of each position
+        """
+        half_width = z * np.sqrt(self.variance() / np.maximum(self.count, 1))
+        return self.mean - half_width, self.mean + half_width
+
+    def percentile(self, q):
+        """
+        :param q: float
+                    The percentile, from 0 to 100
+        :return: np.ndarray
+                    The q-th percentile of each position: the centre of the
+                    histogram bin that holds it, clipped to the smallest and
+                    largest value seen at that position
+        """
+        if self.bins is None:
+            raise ValueError("Percentiles need a CurveAggregator with bins")
+        cumulative = np.cumsum(self.histogram, axis=1)
+        rank = np.maximum(np.ceil(q / 100 * self.count), 1)
+        bins = (cumulative < rank[:, None]).sum(axis=1)
+        centres = (bins + 0.5) * 100 / self.bins
+        return np.clip(centres, self.minimum, self.maximum)
+
+
+def aggregate_trials(matrix, number_of_trials, seed=None, workers=None,
+                     chunk_size=100, bins=None):
+    """ Simulates the work evaluation of random orderings of the mutants and
+    folds each chunk of curves into a CurveAggregator as soon as it is done,
+    so only one chunk of curves is held at a time. See documentation for
+    iter_trial_chunks
+
+    :param bins: int
+                The number of histogram bins of the aggregator (default
+                None, no percentiles)
+    :return: CurveAggregator
+                The aggregate of the curves of all the trials
+    """
+    aggregator = CurveAggregator(bins)
+    for curves, _ in iter_trial_chunks(matrix, number_of_trials, seed,
+                                       workers, chunk_size):
+        aggregator.add(curves)
+    return aggregator
+
+
+def summarize_trials(matrix, number_of_trials, seed=None, workers=None,
+                     chunk_size=100):
+    """ Simulates the work evaluation of random orderings of the mutants and
+    averages the summary metrics of the trials, chunk by chunk, without
+    keeping their curves. See documentation for iter_trial_chunks and
+    summarize_curves
+
+    :return: dict[str: float]
+                The mean of each metric over the trials that have it (a
+                work_to_<X> metric is NaN for trials that never reach X%)
+    """
+    sums: Optional[dict] = dict()
+    counts: Optional[dict] = dict()
+    for curves, lengths in iter_trial_chunks(matrix, number_of_trials, seed,
+                                             workers, chunk_size):
+        for metric, values in summarize_curves(curves, lengths).items():
+            values = np.asarray(values, dtype=float)
+            sums[metric] = sums.get(metric, 0) + np.nansum(values)
+            counts[metric] = counts.get(metric, 0) + \
+                np.count_nonzero(~np.isnan(values))
+    return {metric: float(sums[metric] / counts[metric]) if counts[metric]
+            else np.nan for metric in sums}
@@ -141,18 +141,18 @@ class Graph:
 # Credit to Sam Kaufman for providing most of the starter code for the
 # following function most of the code for the following loop
 
-# Due to the length of the .txt files, two different mappings are imported
-# by iterating only once over the lines in the file to improve performance.
-def import_mutant_relation(txt_file):
-    """Imports the subsumpstion relation and mutant to group identifier from txt
+# Due to the length of the .txt files, all the mappings are read by iterating
+# only once over the lines in the file to improve performance.
+def _iter_mutant_relation(txt_file):
+    """Parses the subsumption relation txt file line by line
 
-        It takes a text file that contains mappings of:
-         - group name identifiers to mutant names
-         - subsumption relationship between groups of equivalent mutants
-         - and their status after a test (lived/killed).
+        Yields one record for every line that carries information:
+         - ("member", group_id, mutant_id) for a group to mutant name mapping
+         - ("relation", parent_id, child_id) for a subsumption relationship
+         - ("relation", parent_id, None) for a group that subsumes no groups
 
-        This function uses regular expressions for pattern matching and
-        iterates only once over the text file to generate the mappings.
+        Groups whose mutants live (Dl = -1.0) are not reported as parents.
+        See documentation for import_mutant_relation for the file layout.
 
         Parameters:
             txt_file: File (.txt)
@@ -160,16 +160,8 @@ def import_mutant_relation(txt_file):
                 to mutant names, subsumption relationship between groups of
                 equivalent mutants, and their status after a test (lived/killed)
 
-        Returns
-            (tuple): containing
-                relationships : Dict[frozenset, frozenset]
-                    A mapping (identifiers -> identifiers) from dominating
-                    mutant groups to the mutant groups they subsume
-
-                group_names : Dict[frozenset, frozenset]
-                    A mapping from each mutant group identifier to its mutant
-                    name identifiers
-
+        Yields:
+            record: tuple(str, int, Optional[int])
     """
     # Regex Patterns
     subsumption_header_pattern = re.compile(
@@ -188,10 +180,7 @@ def import_mutant_relation(txt_file):
     began_subsumption_section = False
     began_group_to_mutant_section = False
 
-    # Variable that store desired mappings and information
     current_group_id: Optional[int] = None
-    relationships: Optional[Dict[frozenset, frozenset]] = dict()
-    group_names: Optional[Dict[frozenset, frozenset]] = dict()
 
     # keep track of mutants who live
     living_mutants: Optional[Set[int]] = set()
@@ -231,10 +220,7 @@ def import_mutant_relation(txt_file):
             rel_match2 = group_id_to_name_pattern.match(line)
             if rel_match2:
                 assert current_group_id is not None
-                name_set2 = frozenset({current_group_id})
-                set_holder2 = group_names.get(name_set2, set())
-                set_holder2.add(int(rel_match2.group(3)))
-                group_names[name_set2] = set_holder2
+                yield "member", current_group_id, int(rel_match2.group(3))
                 continue
             if not began_subsumption_section:
                 continue
@@ -248,20 +234,60 @@ def import_mutant_relation(txt_file):
                 subsumed_count = int(header_match.group(2))
                 # adding groups that don't subsume other groups
                 if subsumed_count == 0:
-                    name_set = frozenset({current_group_id})
-                    set_holder = relationships.get(name_set, set())
-                    relationships[name_set] = set_holder
+                    yield "relation", current_group_id, None
                 continue
             rel_match = subsumption_relationship_pattern.match(line)
             if rel_match:
                 assert current_group_id is not None
-                name_set = frozenset({current_group_id})
-                set_holder = relationships.get(name_set, set())
-                set_holder.add(int(rel_match.group(1)))
-                relationships[name_set] = set_holder
+                yield "relation", current_group_id, int(rel_match.group(1))
                 continue
             raise ValueError("No pattern matched line: {}".format(line))
-        return relationships, group_names
+
+
+def import_mutant_relation(txt_file):
+    """Imports the subsumpstion relation and mutant to group identifier from txt
+
+        It takes a text file that contains mappings of:
+         - group name identifiers to mutant names
+         - subsumption relationship between groups of equivalent mutants
+         - and their status after a test (lived/killed).
+
+        This function uses regular expressions for pattern matching and
+        iterates only once over the text file to generate the mappings.
+
+        Parameters:
+            txt_file: File (.txt)
+                a text file that contains mappings of group name identifiers
+                to mutant names, subsumption relationship between groups of
+                equivalent mutants, and their status after a test (lived/killed)
+
+        Returns
+            (tuple): containing
+                relationships : Dict[frozenset, frozenset]
+                    A mapping (identifiers -> identifiers) from dominating
+                    mutant groups to the mutant groups they subsume
+
+                group_names : Dict[frozenset, frozenset]
+                    A mapping from each mutant group identifier to its mutant
+                    name identifiers
+
+    """
+    # Variable that store desired mappings and information
+    relationships: Optional[Dict[frozenset, frozenset]] = dict()
+    group_names: Optional[Dict[frozenset, frozenset]] = dict()
+
+    for record, group_id, identifier in _iter_mutant_relation(txt_file):
+        name_set = frozenset({group_id})
+        if record == "member":
+            set_holder = group_names.get(name_set, set())
+            set_holder.add(identifier)
+            group_names[name_set] = set_holder
+        else:
+            set_holder = relationships.get(name_set, set())
+            if identifier is not None:
+                set_holder.add(identifier)
+            relationships[name_set] = set_holder
+    return relationships, group_names
 
 
 def generate_dominator_mutants(relationships, group_names):
@@ -306,3 +332,49 @@ def generate_dominator_mutants(relationships, group_names):
                                                        dominant_node]))
 
     return dominator_set_by_mutant_name, dominator_set_by_group
+
+
+def generate_dominator_mutants_from_txt(txt_file):
+    """Generates the dominator mutant set in a single pass over the txt file
+
+        Produces the same result as calling generate_dominator_mutants on the
+        output of import_mutant_relation, but never builds the Graph. While
+        parsing, it keeps the set of groups that appear as a parent and the
+        set of groups that ever appear as a subsumed child; a dominator is a
+        parent group that is never subsumed.
+
+        Parameters
+            txt_file: File (.txt)
+                a text file that contains mappings of group name identifiers
+                to mutant names, subsumption relationship between groups of
+                equivalent mutants, and their status after a test (lived/killed)
+        Returns
+            (tuple): containing
+                dominator_set_by_mutant_name: set[frozenset]
+                    The set of mutant name identifiers of mutants in a
+                    dominating set.
+
+                dominator_set_by_group: set[frozenset]
+                    The set of group name identifiers of mutants in a
+                    dominating set.
+    """
+    group_names: Optional[Dict[int, Set[int]]] = dict()
+    parent_groups: Optional[Dict[int, None]] = dict()
+    subsumed_groups: Optional[Set[int]] = set()
+
+    for record, group_id, identifier in _iter_mutant_relation(txt_file):
+        if record == "member":
+            group_names.setdefault(group_id, set()).add(identifier)
+        else:
+            parent_groups[group_id] = None
+            if identifier is not None:
+                subsumed_groups.add(identifier)
+
+    dominator_set_by_group: Optional[set[frozenset]] = set()
+    dominator_set_by_mutant_name: Optional[set[frozenset]] = set()
+    for group_id in parent_groups:
+        if group_id not in subsumed_groups:
+            dominator_set_by_group.add(frozenset({group_id}))
+            dominator_set_by_mutant_name.add(frozenset(group_names[group_id]))
+
+    return dominator_set_by_mutant_name, dominator_set_by_group
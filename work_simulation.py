@@ -0,0 +1,412 @@
+import random
+
+import numpy as np
+
+
+def simulate_work(sorted_mutants, killmap, rev_killmap,
+                  total_number_of_mutants, rng=None):
+    """Simulates the work needed to kill the mutants in a given order
+
+    The first mutant in sorted_mutants that is still alive is presented to
+    the tester, who writes one of the tests that kill it (chosen at random).
+    That test kills every mutant in rev_killmap[test]. After each test, the
+    percentage of the mutants killed so far is recorded. This is repeated
+    until every mutant is killed or the ordering is exhausted.
+
+    rev_killmap serves as a test -> mutants inverted index, alive mutants are
+    kept in a set, the ordering is walked with a pointer and the number of
+    mutants killed is a running counter, so each simulated test costs time
+    proportional to the mutants it kills. None of the arguments are modified.
+
+    Parameters:
+        sorted_mutants: list[frozenset]
+            A pre-sorted list of mutant identifiers
+        killmap: dict[frozenset: set()]
+            A mapping from a set of identifiers from mutants killed to a
+            set of identifiers for tests that kill each mutant.
+        rev_killmap: dict[int: set()]
+            A mapping from each test identifier to the set of mutant
+            identifiers that it kills.
+        total_number_of_mutants: int
+            The total number of mutants that were generated for this bug for
+            this evaluation
+        rng: random.Random or np.random.Generator
+            The source of randomness used to pick tests (default the random
+            module)
+
+    Returns:
+        (tuple): containing
+            plot: list[float]
+                A list of y-coordinates for the plot points representing work
+                evaluation for a given type of mutants.
+            count: int
+                The number of mutants killed
+    """
+    if rng is None:
+        rng = random
+
+    alive = set(killmap)
+    count = 0
+    plot = [0]
+    position = 0
+    while alive and position < len(sorted_mutants):
+        mutant = sorted_mutants[position]
+        if mutant not in alive:
+            position += 1
+            continue
+
+        # randomly select a test from the set of tests that kill that mutant
+        selected_test = rng.choice(sorted(killmap[mutant]))
+        for killed_mutant in rev_killmap[selected_test]:
+            if killed_mutant in alive:
+                alive.remove(killed_mutant)
+                count += len(killed_mutant)
+
+        plot.append((count / total_number_of_mutants) * 100)
+
+    return plot, count
+
+
+class KillMatrix:
+    """A unique kill map in compressed sparse row (CSR) form
+
+    Groups of indistinguishable mutants and tests are numbered from 0. The
+    tests that kill group g are group_tests[group_test_ptr[g]:
+    group_test_ptr[g + 1]] (in increasing test identifier order) and the
+    groups killed by test t are test_groups[test_group_ptr[t]:
+    test_group_ptr[t + 1]].
+    """
+
+    def __init__(self, killmap):
+        """Builds the CSR arrays of a unique kill map
+
+        Parameters:
+            killmap: dict[frozenset: set()]
+                A mapping from the merged identifiers of each group of
+                indistinguishable mutants to the set of identifiers of the
+                tests that kill them.
+
+        Attributes:
+            self.groups: list[frozenset]
+                The group keys of killmap, by group index
+            self.group_index: dict[frozenset: int]
+                The index of each group
+            self.mutant_index: dict[int: int]
+                The index of the group of each mutant
+            self.tests: list[int]
+                The sorted test identifiers, by test index
+            self.group_sizes: np.ndarray
+                The number of mutants in each group
+            self.total_number_of_mutants: int
+                The number of mutants in all groups
+            self.group_test_ptr, self.group_tests: np.ndarray
+                The tests that kill each group
+            self.test_group_ptr, self.test_groups: np.ndarray
+                The groups killed by each test
+        """
+        self.groups = list(killmap)
+        self.group_index = {group: index
+                            for index, group in enumerate(self.groups)}
+        self.mutant_index = {mutant: index
+                             for index, group in enumerate(self.groups)
+                             for mutant in group}
+        self.tests = sorted(set().union(*killmap.values()))
+        test_index = {test: index for index, test in enumerate(self.tests)}
+
+        self.group_sizes = np.array([len(group) for group in self.groups],
+                                    dtype=np.int64)
+        self.total_number_of_mutants = int(self.group_sizes.sum())
+
+        group_tests = [sorted(test_index[test] for test in killmap[group])
+                       for group in self.groups]
+        self.group_test_ptr = np.zeros(len(self.groups) + 1, dtype=np.int64)
+        np.cumsum([len(tests) for tests in group_tests],
+                  out=self.group_test_ptr[1:])
+        self.group_tests = np.fromiter(
+            (test for tests in group_tests for test in tests),
+            dtype=np.int64, count=int(self.group_test_ptr[-1]))
+
+        # transpose: a stable sort by test keeps the groups of a test in
+        # increasing group index order
+        group_of_entry = np.repeat(np.arange(len(self.groups)),
+                                   np.diff(self.group_test_ptr))
+        by_test = np.argsort(self.group_tests, kind='stable')
+        self.test_groups = group_of_entry[by_test]
+        self.test_group_ptr = np.zeros(len(self.tests) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.group_tests, minlength=len(self.tests)),
+                  out=self.test_group_ptr[1:])
+        self._freeze()
+
+    def __setstate__(self, state):
+        # unpickled arrays are writable again
+        self.__dict__.update(state)
+        self._freeze()
+
+    def _freeze(self):
+        # the matrix is shared by every simulation, which keeps its own state
+        for name in self.ARRAY_NAMES:
+            getattr(self, name).setflags(write=False)
+
+    def new_alive_mask(self):
+        """Returns the state of a new simulation: every group is alive
+
+        Returns:
+            alive: np.ndarray
+                A boolean array with one True flag per group
+        """
+        return np.ones(len(self.group_sizes), dtype=bool)
+
+    # the arrays simulate_random_trials reads, see from_arrays
+    ARRAY_NAMES = ("group_sizes", "group_test_ptr", "group_tests",
+                   "test_group_ptr", "test_groups")
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Rebuilds a kill matrix from its arrays, without the group and test
+        keys (e.g. from arrays mapped in shared memory)
+
+        Parameters:
+            arrays: dict[str: np.ndarray]
+                The arrays named in KillMatrix.ARRAY_NAMES
+
+        Returns:
+            matrix: KillMatrix
+                A kill matrix whose groups, tests and indexes are None
+        """
+        matrix = cls.__new__(cls)
+        matrix.groups = None
+        matrix.group_index = None
+        matrix.mutant_index = None
+        matrix.tests = None
+        for name in cls.ARRAY_NAMES:
+            setattr(matrix, name, arrays[name])
+        matrix.total_number_of_mutants = int(matrix.group_sizes.sum())
+        matrix._freeze()
+        return matrix
+
+
+def simulate_ordering(matrix, order, rng=None, plot=None):
+    """Simulates the work needed to kill the groups of a kill matrix in a
+    given order
+
+    This is simulate_work over a KillMatrix: the matrix is only read and the
+    simulation keeps its own alive mask, so one matrix serves any number of
+    orderings. With the same rng, the same tests are picked as by
+    simulate_work on the orderings' groups.
+
+    Parameters:
+        matrix: KillMatrix
+            The kill matrix of the mutants
+        order: Iterable[int]
+            A pre-sorted sequence of group indices
+        rng: random.Random or np.random.Generator
+            The source of randomness used to pick tests (default the random
+            module)
+        plot: list[float] or CurveMetrics
+            Where the y-coordinates after the starting 0 are appended
+            (default a new list [0]); a CurveMetrics keeps only the summary
+            metrics of the curve
+
+    Returns:
+        (tuple): containing
+            plot: list[float] or CurveMetrics
+                A list of y-coordinates for the plot points representing work
+                evaluation for a given ordering
+            count: int
+                The number of mutants killed
+    """
+    if rng is None:
+        rng = random
+
+    if plot is None:
+        plot = [0]
+
+    alive = matrix.new_alive_mask()
+    remaining = len(alive)
+    count = 0
+    for group in order:
+        if not remaining:
+            break
+        if not alive[group]:
+            continue
+
+        # randomly select a test from the tests that kill that group
+        selected_test = rng.choice(matrix.group_tests[
+            matrix.group_test_ptr[group]:matrix.group_test_ptr[group + 1]])
+        killed = matrix.test_groups[
+            matrix.test_group_ptr[selected_test]:
+            matrix.test_group_ptr[selected_test + 1]]
+        killed = killed[alive[killed]]
+        alive[killed] = False
+        remaining -= len(killed)
+        count += int(matrix.group_sizes[killed].sum())
+
+        plot.append((count / matrix.total_number_of_mutants) * 100)
+
+    return plot, count
+
+
+def simulate_random_trials(matrix, orders, uniforms):
+    """Simulates the work evaluation of many orderings at once
+
+    Every row of orders is one trial, simulated exactly as simulate_work
+    would: at step s, trial r presents its first alive group g, and the
+    test at position floor(uniforms[r, s] * number of tests of g) among the
+    tests of g is written. All trials advance together: the step is a few
+    vectorized operations over (trial x group) arrays of alive flags, and the
+    groups killed by the selected tests are gathered from the CSR arrays of
+    the kill matrix. Each trial keeps a count of its alive groups, so a step
+    only touches the active trials' pointers and the killed groups, never a
+    whole row of flags.
+
+    Parameters:
+        matrix: KillMatrix
+            The kill matrix shared by all trials
+        orders: np.ndarray
+            A (trials x groups) array; each row is an ordering of the group
+            indices
+        uniforms: np.ndarray
+            A (trials x groups) array of floats in [0, 1) used to pick tests;
+            a trial never takes more steps than there are groups
+
+    Returns:
+        (tuple): containing
+            curves: np.ndarray
+                A (trials x longest curve) array of y-coordinates, as in
+                simulate_work; positions after the end of a shorter curve are
+                NaN
+            lengths: np.ndarray
+                The length of each trial's curve
+    """
+    number_of_trials, number_of_groups = orders.shape
+    trial_index = np.arange(number_of_trials)
+    alive = np.ones((number_of_trials, number_of_groups), dtype=bool)
+    pointer = np.zeros(number_of_trials, dtype=np.int64)
+    count = np.zeros(number_of_trials, dtype=np.int64)
+    remaining = np.full(number_of_trials, number_of_groups, dtype=np.int64)
+    lengths = np.ones(number_of_trials, dtype=np.int64)
+    curves = np.full((number_of_trials, number_of_groups + 1), np.nan)
+    curves[:, 0] = 0
+
+    active = trial_index[np.full(number_of_trials, number_of_groups > 0)]
+    step = 0
+    while len(active):
+        # move each pointer to the first alive group of its ordering
+        current = orders[active, pointer[active]]
+        dead = ~alive[active, current]
+        while dead.any():
+            pointer[active[dead]] += 1
+            current[dead] = orders[active[dead], pointer[active[dead]]]
+            dead[dead] = ~alive[active[dead], current[dead]]
+
+        # pick a test among the tests that kill the current group
+        first_test = matrix.group_test_ptr[current]
+        number_of_tests = matrix.group_test_ptr[current + 1] - first_test
+        selected_tests = matrix.group_tests[
+            first_test + (uniforms[active, step] *
+                          number_of_tests).astype(np.int64)]
+
+        # gather every (trial, group) pair killed by the selected tests
+        first_group = matrix.test_group_ptr[selected_tests]
+        number_killed = matrix.test_group_ptr[selected_tests + 1] - first_group
+        rows = np.repeat(active, number_killed)
+        offsets = np.arange(int(number_killed.sum())) - np.repeat(
+            np.cumsum(number_killed) - number_killed, number_killed)
+        columns = matrix.test_groups[np.repeat(first_group, number_killed) +
+                                     offsets]
+        newly_killed = alive[rows, columns]
+        count += np.bincount(
+            rows[newly_killed],
+            weights=matrix.group_sizes[columns[newly_killed]],
+            minlength=number_of_trials).astype(np.int64)
+        # a selected test kills each group at most once
+        remaining -= np.bincount(rows[newly_killed],
+                                 minlength=number_of_trials)
+        alive[rows, columns] = False
+
+        step += 1
+        curves[active, step] = \
+            (count[active] / matrix.total_number_of_mutants) * 100
+        lengths[active] += 1
+        active = active[remaining[active] > 0]
+
+    return curves[:, :int(lengths.max())], lengths
+
+
+class CurveMetrics:
+    """Summary metrics of a work evaluation or test completeness curve,
+    computed point by point without storing the curve
+
+    It is used in place of the plot list: the curve starts at 0 and every
+    following y-coordinate is given to append.
+    """
+
+    # the completeness percentages whose work is reported
+    THRESHOLDS = (50, 80, 100)
+
+    def __init__(self, thresholds=THRESHOLDS):
+        """
+        Parameters:
+            thresholds: tuple[float]
+                The completeness percentages whose work is reported
+        """
+        self.work = 0
+        self.last = 0
+        self.area = 0
+        self.work_to = {threshold: np.nan for threshold in thresholds}
+
+    def append(self, point):
+        """Adds the next y-coordinate of the curve
+
+        Parameters:
+            point: float
+                The completeness after one more unit of work
+        """
+        self.work += 1
+        self.area += (self.last + point) / 2
+        self.last = point
+        for threshold, work in self.work_to.items():
+            if np.isnan(work) and point >= threshold:
+                self.work_to[threshold] = self.work
+
+    def summary(self):
+        """
+        Returns:
+            summary: dict[str: float]
+                "work" (the number of steps of the curve), "final" (its last
+                y-coordinate), "auc" (the area under it, by the trapezoidal
+                rule with one unit of work per step) and "work_to_<X>" (the
+                work needed to reach X% completeness, NaN if never reached)
+        """
+        summary = {"work": self.work, "final": self.last, "auc": self.area}
+        for threshold, work in self.work_to.items():
+            summary["work_to_{:g}".format(threshold)] = work
+        return summary
+
+
+def summarize_curves(curves, lengths, thresholds=CurveMetrics.THRESHOLDS):
+    """Computes the CurveMetrics summary of many curves at once
+
+    Parameters:
+        curves: np.ndarray
+            A (curves x positions) array padded with NaN after the end of
+            each curve, as returned by simulate_random_trials
+        lengths: np.ndarray
+            The length of each curve
+        thresholds: tuple[float]
+            The completeness percentages whose work is reported
+
+    Returns:
+        summary: dict[str: np.ndarray]
+            The metrics of CurveMetrics.summary, one value per curve
+    """
+    rows = np.arange(len(curves))
+    summary = {"work": lengths - 1,
+               "final": curves[rows, lengths - 1],
+               "auc": np.nansum((curves[:, 1:] + curves[:, :-1]) / 2,
+                                axis=1)}
+    for threshold in thresholds:
+        reached = np.nan_to_num(curves, nan=-np.inf) >= threshold
+        summary["work_to_{:g}".format(threshold)] = np.where(
+            reached.any(axis=1), reached.argmax(axis=1), np.nan)
+    return summary